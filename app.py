@@ -119,7 +119,7 @@ def register_all_handlers():
     @bot.message_handler(func=lambda message: True, content_types=['text'])
     @unhandled_exception_handler
     def handle_unknown_text_main(message: Message):
-        if message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()): return
+        if message.date < bot.BOT_START_TS: return
         user_id = message.chat.id
         user_s_data = get_user_data(user_id)
         if user_s_data.state == BotState.DONATE_CUSTOM_AMOUNT_INPUT:
@@ -130,7 +130,7 @@ def register_all_handlers():
     @bot.message_handler(func=lambda message: True, content_types=['audio', 'photo', 'voice', 'video', 'document', 'location', 'contact', 'sticker'])
     @unhandled_exception_handler
     def handle_unknown_content_main(message: Message):
-        if message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()): return
+        if message.date < bot.BOT_START_TS: return
         user_id = message.chat.id
         user_s_data = get_user_data(user_id)
         if user_s_data.state == BotState.DONATE_CUSTOM_AMOUNT_INPUT:
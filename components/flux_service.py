@@ -53,6 +53,7 @@ def generate_image_with_flux(
         logging.error(f"Unexpected error during FLUX hf_client.predict: {e}", exc_info=True)
         raise FluxGenerationError(f"Image generation failed with an unexpected internal error.") from e
 
+    # gradio_client always downloads outputs into its local cache, so the result is a file path
     image_path = _extract_image_path(result)
     
     if image_path and os.path.exists(image_path):
@@ -1,6 +1,6 @@
 # components/gemini_service.py
 import logging
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
 from functools import lru_cache
 
 import google.generativeai as genai
@@ -53,4 +53,25 @@ def send_message_to_gemini(chat_session: ChatSession, prompt_text: str) -> str:
         raise GeminiBlockedPromptError(str(bpe))
     except Exception as e:
         logging.error(f"Error sending message to Gemini: {e}", exc_info=True)
-        raise GeminiChatError(f"Error processing Gemini message: {e}")
\ No newline at end of file
+        raise GeminiChatError(f"Error processing Gemini message: {e}")
+
+def stream_message_to_gemini(chat_session: ChatSession, prompt_text: str) -> Iterator[str]:
+    if not chat_session:
+        logging.error("Cannot stream message: Gemini chat session not provided or not initialized.")
+        raise GeminiChatError("Chat session is not active.")
+
+    try:
+        logging.debug("Streaming prompt to Gemini.")
+        for chunk in chat_session.send_message(prompt_text, stream=True):
+            try:
+                chunk_text = chunk.text
+            except ValueError:
+                continue
+            if chunk_text:
+                yield chunk_text
+    except generation_types.BlockedPromptException as bpe:
+        logging.warning(f"Gemini blocked prompt: {bpe}")
+        raise GeminiBlockedPromptError(str(bpe))
+    except Exception as e:
+        logging.error(f"Error streaming message from Gemini: {e}", exc_info=True)
+        raise GeminiChatError(f"Error processing Gemini message: {e}")
@@ -2,6 +2,7 @@
 import logging
 from typing import Dict, Optional, Any, Callable
 from collections import defaultdict
+from functools import lru_cache
 
 from .settings_config import settings
 
@@ -77,7 +78,6 @@ LANGUAGES: Dict[str, Dict[str, Any]] = {
         'change_model_button': "Change model",
         'new_chat_button': "New chat",
         'flux_mode': "🖼️ You are now in FLUX image generation mode. Describe the image you want to generate.\n🖌️ *English only*\n\n🚪 Use the button below to exit this mode.",
-        'flux_generating': "_⏳ Generating your image, please wait..._",
         'flux_error': "Error generating image: {error}",
         'flux_dimensions_prompt': "Please select image dimensions:\n\n🚪 Use the button below to exit this mode.",
         'flux_reenter_prompt_button': "Re-enter Prompt",
@@ -110,6 +110,8 @@ LANGUAGES: Dict[str, Dict[str, Any]] = {
         'error_setting_model_alert': "An error occurred setting the model.",
         'invalid_language_alert': "Error: Invalid language.",
         'processing_message': "_⏳ Processing..._",
+        'gemini_busy': "⏳ The AI service is busy right now. Please try again in a moment.",
+        'gemini_still_processing': "⏳ Still working on your previous message, please wait.",
         'error_init_gemini': "Error initializing Gemini: {error}",
         'error_start_new_gemini': "Error starting new Gemini chat: {error}",
         'error_executing_command': "Error executing command {command}.",
@@ -119,6 +121,7 @@ LANGUAGES: Dict[str, Dict[str, Any]] = {
         'rate_limit_alert': "Rate limit exceeded. Please wait.",
         'flux_service_unavailable_alert': "Image generation service unavailable.",
         'flux_session_expired_alert': "Session expired or data missing. Please start again with /flux.",
+        'flux_already_generating_alert': "Your image is already being generated. Please wait.",
         'flux_generation_failed': "Image generation failed.",
         'mistral_busy': "The AI service is currently busy, please try again in a moment.",
         'mistral_invalid_response': "Invalid API response structure",
@@ -149,7 +152,7 @@ LANGUAGES: Dict[str, Dict[str, Any]] = {
         'getid_sender_id': "Telegram ID of the sender: {sender_id}",
         'not_forwarded': "⚠️ This doesn't seem to be a forwarded message. Please forward a message.",
         'getid_reset': "Ready for the next request. Use /getid again if needed.",
-        'flux_selected_dim_confirm': "Selected ⌗ {width}x{height}",
+        'flux_selected_and_generating': "Selected ⌗ {width}x{height}\n\n_⏳ Generating your image, please wait..._",
         'back_button': "↩️ Back",
         'owner_cmd_addtrusted_success': "User {target_user_id} added to trusted list.",
         'owner_cmd_addtrusted_already': "User {target_user_id} is already trusted.",
@@ -198,7 +201,6 @@ LANGUAGES: Dict[str, Dict[str, Any]] = {
         'change_model_button': "Сменить модель",
         'new_chat_button': "Начать новый чат",
         'flux_mode': "🖼️ Вы в режиме генерации изображений FLUX. Опишите изображение, которое хотите создать.\n🖌️ *Только на английском языке*\n\n🚪 Используйте кнопку ниже, чтобы выйти из этого режима.",
-        'flux_generating': "_⏳ Генерация изображения, пожалуйста, подождите..._",
         'flux_error': "Ошибка при генерации изображения: {error}",
         'flux_dimensions_prompt': "Пожалуйста, выберите размеры изображения:\n\n🚪 Используйте кнопку ниже, чтобы выйти из этого режима.",
         'flux_reenter_prompt_button': "Ввести запрос заново",
@@ -231,6 +233,8 @@ LANGUAGES: Dict[str, Dict[str, Any]] = {
         'error_setting_model_alert': "Произошла ошибка при установке модели.",
         'invalid_language_alert': "Ошибка: Неверный язык.",
         'processing_message': "_⏳ Обработка..._",
+        'gemini_busy': "⏳ Сервис ИИ сейчас занят. Пожалуйста, попробуйте чуть позже.",
+        'gemini_still_processing': "⏳ Ещё обрабатываю предыдущее сообщение, пожалуйста, подождите.",
         'error_init_gemini': "Ошибка инициализации Gemini: {error}",
         'error_start_new_gemini': "Ошибка при запуске нового чата Gemini: {error}",
         'error_executing_command': "Ошибка выполнения команды {command}.",
@@ -240,6 +244,7 @@ LANGUAGES: Dict[str, Dict[str, Any]] = {
         'rate_limit_alert': "Превышен лимит запросов. Пожалуйста, подождите.",
         'flux_service_unavailable_alert': "Сервис генерации изображений недоступен.",
         'flux_session_expired_alert': "Сессия истекла или данные отсутствуют. Пожалуйста, начните снова с /flux.",
+        'flux_already_generating_alert': "Изображение уже генерируется. Пожалуйста, подождите.",
         'flux_generation_failed': "Ошибка генерации изображения.",
         'mistral_busy': "Сервис ИИ сейчас занят, попробуйте еще раз через мгновение.",
         'mistral_invalid_response': "Неверная структура ответа API",
@@ -270,7 +275,7 @@ LANGUAGES: Dict[str, Dict[str, Any]] = {
         'getid_sender_id': "Telegram ID отправителя: {sender_id}",
         'not_forwarded': "⚠️ Это сообщение не похоже на пересланное. Пожалуйста, перешлите сообщение.",
         'getid_reset': "Готов к следующему запросу. Используйте /getid снова, если нужно.",
-        'flux_selected_dim_confirm': "Выбрано ⌗ {width}x{height}",
+        'flux_selected_and_generating': "Выбрано ⌗ {width}x{height}\n\n_⏳ Генерация изображения, пожалуйста, подождите..._",
         'back_button': "↩️ Назад",
         'owner_cmd_addtrusted_success': "Пользователь {target_user_id} добавлен в доверенные.",
         'owner_cmd_addtrusted_already': "Пользователь {target_user_id} уже в списке доверенных.",
@@ -345,6 +350,25 @@ def _generate_welcome_message(language: str) -> str:
     return "\n".join(filter(None, parts))
 
 
+@lru_cache(maxsize=4096)
+def _get_template(language: str, key: str) -> Optional[str]:
+    translation_template = LANGUAGES.get(language, _DEFAULT_LANG_DICT).get(key)
+    if translation_template is None:
+        translation_template = _DEFAULT_LANG_DICT.get(key)
+        if translation_template is not None:
+            logging.debug(f"Using default language for key '{key}' as it's missing in '{language}'.")
+    return translation_template
+
+
+@lru_cache(maxsize=4096)
+def _render_static(language: str, key: str) -> str:
+    try:
+        return str(_get_template(language, key)).format_map(defaultdict(lambda: ""))
+    except Exception as e:
+        logging.error(f"Unexpected formatting error for key '{key}' in language '{language}'. Error: {e}", exc_info=True)
+        return f"[Formatting Error: {key}]"
+
+
 def get_translation(
     language: str,
     key: str,
@@ -357,19 +381,16 @@ def get_translation(
     if key == 'welcome':
         return _generate_welcome_message(language).format_map(kwargs)
 
-    lang_dict = LANGUAGES.get(language, _DEFAULT_LANG_DICT)
-    translation_template = lang_dict.get(key)
+    translation_template = _get_template(language, key)
 
     if translation_template is None:
-        translation_template = _DEFAULT_LANG_DICT.get(key)
-        if translation_template is None:
-            if default is not None:
-                translation_template = default
-            else:
-                logging.warning(f"Missing translation for key '{key}' in language '{language}' and default.")
-                return f"Missing translation: {key}"
+        if default is not None:
+            translation_template = default
         else:
-            logging.debug(f"Using default language for key '{key}' as it's missing in '{language}'.")
+            logging.warning(f"Missing translation for key '{key}' in language '{language}' and default.")
+            return f"Missing translation: {key}"
+    elif not kwargs and key not in _KEY_DEFAULT_ARGS_GENERATORS:
+        return _render_static(language, key)
 
     default_kwargs_from_generator: Dict[str, Any] = {}
     generator = _KEY_DEFAULT_ARGS_GENERATORS.get(key)
@@ -392,4 +413,10 @@ def get_translation(
         return f"[Formatting Error - Missing Key: {key}]"
     except Exception as e:
         logging.error(f"Unexpected formatting error for key '{key}' in language '{language}'. Kwargs: {dict(final_kwargs_dd)}. Error: {e}", exc_info=True)
-        return f"[Formatting Error: {key}]"
\ No newline at end of file
+        return f"[Formatting Error: {key}]"
+
+
+def get_translation_optional(language: str, key: str, **kwargs: Any) -> Optional[str]:
+    if LANGUAGES.get(language, _DEFAULT_LANG_DICT).get(key) is None:
+        return None
+    return get_translation(language, key, **kwargs)
@@ -1,9 +1,19 @@
 # components/mistral_service.py
 import logging
 import json
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = lambda obj: json.dumps(obj, ensure_ascii=False).encode('utf-8')
+    _json_loads = json.loads
 
 class MistralError(Exception):
     pass
@@ -23,6 +33,7 @@ class MistralResponseError(MistralError):
 DEFAULT_MISTRAL_MODEL = "mistral-large-latest"
 DEFAULT_TEMPERATURE = 0.7
 DEFAULT_MAX_TOKENS = 2048
+MISTRAL_API_BASE = "https://api.mistral.ai"
 
 _session_pool = {}
 
@@ -35,6 +46,18 @@ def _get_session(requests_session: Optional[requests.Session] = None) -> tuple[r
         _session_pool[session_id] = requests.Session()
     return _session_pool[session_id], True
 
+def create_mistral_session() -> requests.Session:
+    session = requests.Session()
+    retries = Retry(
+        total=2,
+        backoff_factor=0.25,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset(["POST"]),
+        raise_on_status=False
+    )
+    session.mount(MISTRAL_API_BASE, HTTPAdapter(pool_connections=32, pool_maxsize=128, max_retries=retries))
+    return session
+
 def send_message_to_mistral(
     api_key: str,
     chat_history: List[Dict[str, str]],
@@ -69,9 +92,9 @@ def send_message_to_mistral(
     
     try:
         response = session.post(
-            "https://api.mistral.ai/v1/chat/completions", 
+            f"{MISTRAL_API_BASE}/v1/chat/completions", 
             headers=headers, 
-            json=data, 
+            data=_json_dumps(data), 
             timeout=90
         )
         
@@ -85,7 +108,7 @@ def send_message_to_mistral(
             )
         
         response.raise_for_status()
-        response_json = response.json()
+        response_json = _json_loads(response.content)
         
     except requests.exceptions.HTTPError as http_err:
         response_text = getattr(http_err.response, 'text', 'N/A')
@@ -133,4 +156,87 @@ def send_message_to_mistral(
         raise MistralResponseError(f"Error parsing Mistral API response: {e}")
     except Exception as e:
         logging.error(f"Unexpected error parsing Mistral API response: {e}. Response JSON: {response_json}", exc_info=True)
-        raise MistralResponseError(f"An unexpected error occurred while parsing Mistral API response: {e}")
\ No newline at end of file
+        raise MistralResponseError(f"An unexpected error occurred while parsing Mistral API response: {e}")
+
+def stream_message_to_mistral(
+    api_key: str,
+    chat_history: List[Dict[str, str]],
+    model_name: str = DEFAULT_MISTRAL_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    requests_session: Optional[requests.Session] = None
+) -> Iterator[str]:
+    if not api_key:
+        logging.error("Mistral API key not provided.")
+        raise MistralError("Mistral API key is missing.")
+
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}",
+        "Accept": "text/event-stream"
+    }
+    data = {
+        "model": model_name,
+        "messages": chat_history,
+        "temperature": temperature,
+        "top_p": 1,
+        "max_tokens": max_tokens,
+        "stream": True,
+        "safe_prompt": False,
+    }
+
+    logging.debug(f"Streaming request to Mistral API. Model: {model_name}. History length: {len(chat_history)}")
+
+    session = requests_session or requests
+    try:
+        with session.post(
+            f"{MISTRAL_API_BASE}/v1/chat/completions",
+            headers=headers,
+            data=_json_dumps(data),
+            timeout=90,
+            stream=True
+        ) as response:
+            if response.status_code == 429:
+                response_text = response.text[:200]
+                logging.warning(f"Mistral API rate limit hit (429). Response: {response_text}")
+                raise MistralAPIError(
+                    "The Mistral API service is currently busy (rate limit). Please try again in a moment.",
+                    status_code=429,
+                    response_text=response.text
+                )
+            response.raise_for_status()
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                chunk_json = _json_loads(payload)
+                choices = chunk_json.get('choices') or [{}]
+                chunk_text = (choices[0].get('delta') or {}).get('content')
+                if chunk_text:
+                    yield chunk_text
+    except MistralError:
+        raise
+    except requests.exceptions.HTTPError as http_err:
+        response_text = getattr(http_err.response, 'text', 'N/A')
+        status_code = getattr(http_err.response, 'status_code', None)
+        logging.error(f"Mistral API HTTPError: {status_code} - {response_text[:500]}", exc_info=True)
+        raise MistralAPIError(
+            f"Mistral API request failed with status {status_code}.",
+            status_code=status_code,
+            response_text=response_text
+        )
+    except requests.exceptions.RequestException as req_err:
+        logging.error(f"Mistral API RequestException: {req_err}", exc_info=True)
+        raise MistralAPIError(f"Mistral API request failed due to a network issue: {req_err}")
+    except json.JSONDecodeError as json_err:
+        logging.error(f"Mistral API stream JSONDecodeError: {json_err}", exc_info=True)
+        raise MistralResponseError(f"Failed to decode streamed chunk from Mistral API: {json_err}")
+    except (AttributeError, TypeError, IndexError) as e:
+        logging.error(f"Mistral API stream parsing error: {e}", exc_info=True)
+        raise MistralResponseError(f"Error parsing Mistral API stream: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error during Mistral API stream: {e}", exc_info=True)
+        raise MistralError(f"An unexpected error occurred while communicating with Mistral API: {e}")
@@ -1,8 +1,10 @@
 # components/rate_limiter.py
 import logging
 import re
+import threading
+from collections import deque
 from datetime import datetime, timezone, timedelta
-from typing import TYPE_CHECKING, Union, List, Optional, Any
+from typing import TYPE_CHECKING, Union, Optional, Any, Deque
 
 from .settings_config import settings
 from .user_data_manager import get_user_data, UserData, BotState, block_user_db, unblock_user_db
@@ -12,7 +14,8 @@ if TYPE_CHECKING:
     import telebot
     from telebot.types import Message, CallbackQuery
 
-total_daily_requests_rl: List[datetime] = []
+total_daily_requests_rl: Deque[datetime] = deque()
+_rl_window_lock = threading.Lock()
 _bot_instance: Optional['telebot.TeleBot'] = None
 _markdown_regex = re.compile(r'[*_`~]|\[([^\]]+)\]\([^)]+\)|#+ ')
 
@@ -34,6 +37,23 @@ def _clean_markdown_rl(text: Any) -> str:
     text_str = _markdown_regex.sub(lambda m: m.group(1) if m.group(1) else '', text_str)
     return text_str
 
+def _trim_window(window: Deque[datetime], cutoff: datetime) -> None:
+    # Метки времени добавляются по возрастанию, поэтому устаревшие всегда слева
+    while window and window[0] <= cutoff:
+        window.popleft()
+
+def _count_since(window: Deque[datetime], cutoff: datetime) -> int:
+    count = 0
+    for req in reversed(window):
+        if req <= cutoff:
+            break
+        count += 1
+    return count
+
+def count_user_requests_since(user_s_data: UserData, cutoff: datetime) -> int:
+    with _rl_window_lock:
+        return _count_since(user_s_data.requests_timestamps, cutoff)
+
 def check_rate_limits(user_id: int, command_type: str = "general", increment_request_count: bool = True) -> bool:
     user_s_data: UserData = get_user_data(user_id)
     if user_id in settings.TRUSTED_USERS_SET:
@@ -58,12 +78,6 @@ def check_rate_limits(user_id: int, command_type: str = "general", increment_req
         logging.debug(f"RateLimiter: /rate command check passed for user {user_id}.")
         return True
 
-    day_ago = now - timedelta(hours=24)
-    user_s_data.requests_timestamps = [req for req in user_s_data.requests_timestamps if req > day_ago]
-
-    global total_daily_requests_rl
-    total_daily_requests_rl = [req for req in total_daily_requests_rl if req > day_ago]
-
     def handle_limit_violation(reason_key, limit=None):
         user_s_data.violations += 1
         logging.warning(f"RateLimiter: User {user_id} violation count increased to {user_s_data.violations}/{settings.LIMIT_VIOLATIONS_BEFORE_BLOCK} due to {reason_key}")
@@ -88,35 +102,42 @@ def check_rate_limits(user_id: int, command_type: str = "general", increment_req
             return True
         return False
 
-    if len(total_daily_requests_rl) >= settings.MAX_REQUESTS_PER_DAY:
-        if handle_limit_violation('rate_limit_total_daily', limit=settings.MAX_REQUESTS_PER_DAY):
-            return False
-        return False
-
-    if len(user_s_data.requests_timestamps) >= settings.MAX_REQUESTS_PER_USER_PER_DAY:
-        if handle_limit_violation('rate_limit_daily', limit=settings.MAX_REQUESTS_PER_USER_PER_DAY):
-            return False
+    violation_key, violation_limit = None, None
+    cooldown_hit = False
+    # Проверка и запись в скользящие окна атомарны: иначе параллельные запросы могут проскочить лимит.
+    # Время берётся под блокировкой, чтобы метки в окнах шли строго по возрастанию
+    with _rl_window_lock:
+        now = datetime.now(timezone.utc)
+        day_ago = now - timedelta(hours=24)
+        minute_ago = now - timedelta(minutes=1)
+        _trim_window(user_s_data.requests_timestamps, day_ago)
+        _trim_window(total_daily_requests_rl, day_ago)
+
+        if len(total_daily_requests_rl) >= settings.MAX_REQUESTS_PER_DAY:
+            violation_key, violation_limit = 'rate_limit_total_daily', settings.MAX_REQUESTS_PER_DAY
+        elif len(user_s_data.requests_timestamps) >= settings.MAX_REQUESTS_PER_USER_PER_DAY:
+            violation_key, violation_limit = 'rate_limit_daily', settings.MAX_REQUESTS_PER_USER_PER_DAY
+        elif _count_since(user_s_data.requests_timestamps, minute_ago) >= settings.MAX_REQUESTS_PER_MINUTE:
+            violation_key = 'rate_limit_minute'
+        elif (user_s_data.last_request_timestamp and
+              (now - user_s_data.last_request_timestamp).total_seconds() < settings.REQUEST_COOLDOWN_SECONDS):
+            cooldown_hit = True
+        elif increment_request_count:
+            user_s_data.requests_timestamps.append(now)
+            total_daily_requests_rl.append(now)
+            user_s_data.last_request_timestamp = now
+
+    if violation_key:
+        handle_limit_violation(violation_key, limit=violation_limit)
         return False
 
-    minute_ago = now - timedelta(minutes=1)
-    requests_last_minute = sum(1 for req in user_s_data.requests_timestamps if req > minute_ago)
-    if requests_last_minute >= settings.MAX_REQUESTS_PER_MINUTE:
-        if handle_limit_violation('rate_limit_minute'):
-            return False
+    if cooldown_hit:
+        rate_limit_cooldown_message = get_translation(language=user_s_data.language, key='rate_limit_cooldown', seconds=settings.REQUEST_COOLDOWN_SECONDS)
+        _send_message_rl(user_id, rate_limit_cooldown_message)
         return False
 
-    if user_s_data.last_request_timestamp:
-        time_since_last = (now - user_s_data.last_request_timestamp).total_seconds()
-        if time_since_last < settings.REQUEST_COOLDOWN_SECONDS:
-            rate_limit_cooldown_message = get_translation(language=user_s_data.language, key='rate_limit_cooldown', seconds=settings.REQUEST_COOLDOWN_SECONDS)
-            _send_message_rl(user_id, rate_limit_cooldown_message)
-            return False
-
     if increment_request_count:
         logging.debug(f"RateLimiter: Rate limit check passed AND INCREMENTING for User ID: {user_id}. Request type: {command_type}.")
-        user_s_data.requests_timestamps.append(now)
-        total_daily_requests_rl.append(now)
-        user_s_data.last_request_timestamp = now
     else:
         logging.debug(f"RateLimiter: Rate limit check passed (NO INCREMENT) for User ID: {user_id}. Request type: {command_type}.")
     return True
@@ -1,5 +1,6 @@
 # components/settings_config.py
 import logging
+import threading
 from typing import Dict, List, Optional, Any, Set, Final, Tuple
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -18,7 +19,9 @@ _DEFAULT_BOT_CONTACT_VALUE: Final[str] = "administrator (contact info not set)"
 _INT_FIELDS_TO_CONVERT: Final[frozenset[str]] = frozenset([
     'MAX_REQUESTS_PER_DAY', 'MAX_REQUESTS_PER_USER_PER_DAY', 'MAX_REQUESTS_PER_MINUTE',
     'USER_BLOCK_DURATION_HOURS', 'LIMIT_VIOLATIONS_BEFORE_BLOCK', 'SESSION_LIFETIME_MINUTES',
-    'DEFAULT_DONATION_AMOUNT_STARS', 'BOT_WORKER_THREADS'
+    'DEFAULT_DONATION_AMOUNT_STARS', 'BOT_WORKER_THREADS', 'FLUX_MAX_CONCURRENT',
+    'GEMINI_MAX_CONCURRENT', 'GEMINI_TIMEOUT_SECONDS', 'MISTRAL_WORKERS',
+    'MISTRAL_MAX_HISTORY_TURNS'
 ])
 
 _BOOL_FEATURE_FLAGS: Final[frozenset[str]] = frozenset([
@@ -64,6 +67,11 @@ class BotSettings(BaseSettings):
     DEFAULT_DONATION_AMOUNT_STARS: PositiveInt = 100
     DONATION_PRESET_AMOUNTS: List[PositiveInt] = [10, 50, 100, 250, 500]
     BOT_WORKER_THREADS: PositiveInt = 4
+    FLUX_MAX_CONCURRENT: PositiveInt = 2
+    GEMINI_MAX_CONCURRENT: PositiveInt = 4
+    GEMINI_TIMEOUT_SECONDS: PositiveInt = 120
+    MISTRAL_WORKERS: PositiveInt = 4
+    MISTRAL_MAX_HISTORY_TURNS: PositiveInt = 20
 
     ENABLE_GEMINI_FEATURE: bool = True
     ENABLE_MISTRAL_FEATURE: bool = True
@@ -77,6 +85,7 @@ class BotSettings(BaseSettings):
 
     _bot_owner_user_id_cache: Optional[int] = PrivateAttr(default=None)
     _trusted_users_set_cache: Optional[Set[int]] = PrivateAttr(default=None)
+    _trusted_users_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
 
     @field_validator('BOT_CONTACT_INFO', mode='before')
     @classmethod
@@ -120,6 +129,28 @@ class BotSettings(BaseSettings):
             return None
         return self._bot_owner_user_id_cache
 
+    def _env_trusted_users(self) -> Set[int]:
+        if not self.TRUSTED_USERS_RAW:
+            return set()
+        return {
+            int(stripped_id)
+            for user_id_str in self.TRUSTED_USERS_RAW.split(',')
+            if (stripped_id := user_id_str.strip()).isdigit()
+        }
+
+    def add_trusted_user_to_cache(self, user_id: int) -> None:
+        with self._trusted_users_lock:
+            if self._trusted_users_set_cache is not None:
+                self._trusted_users_set_cache.add(user_id)
+
+    def discard_trusted_user_from_cache(self, user_id: int) -> None:
+        # Владелец и пользователи из TRUSTED_USERS остаются доверенными независимо от БД
+        if user_id == self.BOT_OWNER_USER_ID or user_id in self._env_trusted_users():
+            return
+        with self._trusted_users_lock:
+            if self._trusted_users_set_cache is not None:
+                self._trusted_users_set_cache.discard(user_id)
+
     @property
     def TRUSTED_USERS_SET(self) -> Set[int]:
         if self._trusted_users_set_cache is None:
@@ -132,15 +163,7 @@ class BotSettings(BaseSettings):
                 logging.error(f"Could not load trusted users from DB: {e}. Proceeding without DB trusted users.")
 
 
-            env_trusted_users: Set[int] = set()
-            if self.TRUSTED_USERS_RAW:
-                env_trusted_users = {
-                    int(stripped_id)
-                    for user_id_str in self.TRUSTED_USERS_RAW.split(',')
-                    if (stripped_id := user_id_str.strip()).isdigit()
-                }
-            
-            combined_set = db_trusted_users.union(env_trusted_users)
+            combined_set = db_trusted_users.union(self._env_trusted_users())
             owner_id = self.BOT_OWNER_USER_ID
             if owner_id is not None:
                 combined_set.add(owner_id)
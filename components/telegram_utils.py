@@ -1,10 +1,14 @@
 # components/telegram_utils.py
+import io
 import re
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import List, Optional, Any, Tuple, Callable
 
 import telebot
-from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaDocument
 
 from .settings_config import settings
 
@@ -13,14 +17,26 @@ MARKDOWN_V2_ESCAPE_REGEX = re.compile(r"([*`\[\]()~>#+\-=|{}.!])")
 HTML_ESCAPE_MAP = {'&': '&', '<': '<', '>': '>'}
 
 CLEAN_MARKDOWN_CHARS_REGEX = re.compile(r'[*_`~]')
-CLEAN_MARKDOWN_LINK_REGEX = re.compile(r'\[([^\]]+)\]\([^)]+\)')
-CLEAN_MARKDOWN_HEADER_REGEX = re.compile(r'#+ ')
+CLEAN_MARKDOWN_REGEX = re.compile(r'\[([^\]]+)\]\([^)]+\)|#+ |[*_`~]')
 
 TRIPLE_BACKTICK = "```"
 CODE_TRIPLE_BACKTICK_REGEX = re.compile(re.escape(TRIPLE_BACKTICK))
 PREFERRED_SPLIT_CHARS = ('\n', '.', '!', '?', ';', ':', ',', ' ')
 
 EXTRACT_CODE_BLOCK_REGEX = re.compile(r"```(?:[a-zA-Z0-9_+\-#\.]*?\n)?(.*?)```", re.DOTALL)
+CODE_BLOCK_LANG_REGEX = re.compile(r"```([a-zA-Z0-9_+\-#\.]*)\n(.*)```", re.DOTALL)
+CODE_FILE_EXTENSIONS = {
+    'python': 'py', 'py': 'py', 'javascript': 'js', 'js': 'js', 'typescript': 'ts', 'ts': 'ts',
+    'java': 'java', 'c': 'c', 'cpp': 'cpp', 'c++': 'cpp', 'csharp': 'cs', 'c#': 'cs', 'go': 'go',
+    'rust': 'rs', 'bash': 'sh', 'sh': 'sh', 'shell': 'sh', 'sql': 'sql', 'html': 'html', 'css': 'css',
+    'json': 'json', 'yaml': 'yaml', 'yml': 'yaml', 'xml': 'xml', 'php': 'php', 'ruby': 'rb', 'kotlin': 'kt',
+}
+MEDIA_GROUP_MAX_ITEMS = 10
+
+OUTBOUND_OVERALL_RATE = 30.0
+OUTBOUND_CHAT_RATE = 1.0
+OUTBOUND_CHAT_BURST = 3
+OUTBOUND_MAX_TRACKED_CHATS = 10000
 
 _bot_instance: Optional[telebot.TeleBot] = None
 
@@ -30,6 +46,71 @@ def init_telegram_utils_bot(bot_instance_param: telebot.TeleBot) -> None:
     _bot_instance = bot_instance_param
 
 
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RateLimitedBot:
+    def __init__(self, bot: telebot.TeleBot,
+                 overall_rate: float = OUTBOUND_OVERALL_RATE,
+                 chat_rate: float = OUTBOUND_CHAT_RATE,
+                 chat_burst: int = OUTBOUND_CHAT_BURST,
+                 max_tracked_chats: int = OUTBOUND_MAX_TRACKED_CHATS):
+        self._bot = bot
+        self._overall_limiter = _TokenBucket(overall_rate, overall_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._max_tracked_chats = max_tracked_chats
+        self._chat_limiters: 'OrderedDict[Any, _TokenBucket]' = OrderedDict()
+        self._chat_limiters_lock = threading.Lock()
+
+    def _chat_limiter(self, chat_id: Any) -> _TokenBucket:
+        with self._chat_limiters_lock:
+            limiter = self._chat_limiters.get(chat_id)
+            if limiter is None:
+                limiter = _TokenBucket(self._chat_rate, self._chat_burst)
+                self._chat_limiters[chat_id] = limiter
+                if len(self._chat_limiters) > self._max_tracked_chats:
+                    self._chat_limiters.popitem(last=False)
+            else:
+                self._chat_limiters.move_to_end(chat_id)
+            return limiter
+
+    def _throttle(self, chat_id: Any) -> None:
+        self._chat_limiter(chat_id).acquire()
+        self._overall_limiter.acquire()
+
+    def send_message(self, chat_id, text: str, *args, **kwargs):
+        self._throttle(chat_id)
+        return self._bot.send_message(chat_id, text, *args, **kwargs)
+
+    def edit_message_text(self, text: str, chat_id=None, *args, **kwargs):
+        self._throttle(chat_id)
+        return self._bot.edit_message_text(text, chat_id, *args, **kwargs)
+
+    def delete_message(self, chat_id, *args, **kwargs):
+        self._throttle(chat_id)
+        return self._bot.delete_message(chat_id, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._bot, name)
+
+
 def escape_markdown_v2(text: Any) -> str:
     return MARKDOWN_V2_ESCAPE_REGEX.sub(r"\\\1", str(text))
 
@@ -39,12 +120,15 @@ def escape_html_util(text: Any) -> str:
     return "".join(HTML_ESCAPE_MAP.get(c, c) for c in text_str)
 
 
+def _clean_markdown_match(match: re.Match) -> str:
+    link_text = match.group(1)
+    if link_text is None:
+        return ''
+    return CLEAN_MARKDOWN_CHARS_REGEX.sub('', link_text)
+
+
 def clean_markdown_text(text: Any) -> str:
-    text_str = str(text)
-    text_str = CLEAN_MARKDOWN_CHARS_REGEX.sub('', text_str)
-    text_str = CLEAN_MARKDOWN_LINK_REGEX.sub(r'\1', text_str)
-    text_str = CLEAN_MARKDOWN_HEADER_REGEX.sub('', text_str)
-    return text_str
+    return CLEAN_MARKDOWN_REGEX.sub(_clean_markdown_match, str(text))
 
 
 def split_long_text(text: Any, max_length: int = settings.TELEGRAM_MAX_LENGTH) -> List[str]:
@@ -180,15 +264,12 @@ def get_universal_stop_keyboard(language: str, get_translation_func: Callable) -
 
 def extract_code_blocks(text: str) -> Tuple[str, List[str]]:
     extracted_full_blocks: List[str] = []
-    last_end = 0
-    remaining_text_parts: List[str] = []
-    for match in EXTRACT_CODE_BLOCK_REGEX.finditer(text):
-        remaining_text_parts.append(text[last_end:match.start()])
-        full_block = match.group(0)
-        extracted_full_blocks.append(full_block)
-        last_end = match.end()
-    remaining_text_parts.append(text[last_end:])
-    text_without_code = "".join(remaining_text_parts).strip()
+
+    def _collect(match: re.Match) -> str:
+        extracted_full_blocks.append(match.group(0))
+        return ''
+
+    text_without_code = EXTRACT_CODE_BLOCK_REGEX.sub(_collect, text).strip()
     return text_without_code, extracted_full_blocks
 
 
@@ -215,4 +296,49 @@ def send_code_snippets(
         current_markup = reply_markup_for_last if i == len(code_blocks) - 1 else None
         if len(code_block_content) > settings.MAX_CODE_LENGTH + (len(TRIPLE_BACKTICK) * 2):
              logging.warning(f"Code block for chat {chat_id} is very long ({len(code_block_content)} chars), might be truncated by Telegram.")
-        send_message_splitted(chat_id, code_block_content, parse_mode="Markdown", reply_markup=current_markup)
\ No newline at end of file
+        send_message_splitted(chat_id, code_block_content, parse_mode="Markdown", reply_markup=current_markup)
+
+
+def _code_block_to_file(code_block: str, index: int) -> io.BytesIO:
+    match = CODE_BLOCK_LANG_REGEX.fullmatch(code_block)
+    if match:
+        language, body = match.group(1).lower(), match.group(2)
+    else:
+        language, body = "", code_block[len(TRIPLE_BACKTICK):-len(TRIPLE_BACKTICK)]
+    code_file = io.BytesIO(body.encode('utf-8'))
+    code_file.name = f"snippet_{index}.{CODE_FILE_EXTENSIONS.get(language, 'txt')}"
+    return code_file
+
+
+def send_code_documents(
+    chat_id: int,
+    user_language: str,
+    code_blocks: List[str],
+    get_translation_func: Callable,
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+) -> bool:
+    if not _bot_instance:
+        logging.error("TelegramUtils: Bot instance not initialized for send_code_documents.")
+        return False
+    if not 2 <= len(code_blocks) <= MEDIA_GROUP_MAX_ITEMS:
+        return False
+
+    code_title = get_translation_func(language=user_language, key='code_snippets_title')
+    media = [
+        InputMediaDocument(_code_block_to_file(code_block, i + 1),
+                           caption=code_title if i == 0 else None,
+                           parse_mode="Markdown" if i == 0 else None)
+        for i, code_block in enumerate(code_blocks)
+    ]
+    try:
+        _bot_instance.send_media_group(chat_id, media)
+    except telebot.apihelper.ApiTelegramException as e_api:
+        logging.warning(f"TelegramUtils: Failed to send code snippets as media group to {chat_id}: {e_api}")
+        return False
+
+    if reply_markup:
+        try:
+            _bot_instance.send_message(chat_id, "...", reply_markup=reply_markup, disable_notification=True)
+        except telebot.apihelper.ApiTelegramException as e_api:
+            logging.warning(f"TelegramUtils: Failed to send keyboard after code snippets to {chat_id}: {e_api}")
+    return True
@@ -1,8 +1,10 @@
 # components/user_data_manager.py
 import logging
 import os
-from typing import Dict, List, Optional, Any, Set, Tuple
+import time
+from typing import Dict, List, Optional, Any, Set, Tuple, Deque
 from dataclasses import dataclass, field
+from collections import deque
 from enum import Enum, auto
 from datetime import datetime, timezone, timedelta
 import sqlite3
@@ -33,14 +35,16 @@ class UserData:
     persistent_settings: UserPersistentSettings = field(default_factory=UserPersistentSettings)
     state: BotState = field(default=BotState.NONE)
     gemini_chat: Optional[Any] = field(default=None, repr=False)
-    requests_timestamps: List[datetime] = field(default_factory=list)
+    requests_timestamps: Deque[datetime] = field(default_factory=deque)
     last_request_timestamp: Optional[datetime] = None
     violations: int = 0
     blocked_until_timestamp: Optional[datetime] = None
-    session_start_timestamp: Optional[datetime] = None
+    session_start_timestamp: Optional[float] = None
+    session_deadline_monotonic: Optional[float] = None
     mistral_chat_history: List[Dict[str, str]] = field(default_factory=list)
     last_rate_request_timestamp: Optional[datetime] = None
     flux_data: Dict[str, Any] = field(default_factory=dict)
+    flux_in_flight: bool = False
     custom_donation_prompt_msg_id: Optional[int] = None
     processed_media_group_ids: Set[str] = field(default_factory=set)
 
@@ -64,6 +68,10 @@ class UserData:
             self.persistent_settings.gemini_model = value
             _save_user_persistent_settings_to_db(self.user_id, self.persistent_settings)
 
+    def start_session(self):
+        self.session_start_timestamp = time.time()
+        self.session_deadline_monotonic = time.monotonic() + settings.SESSION_LIFETIME_MINUTES * 60
+
     def reset_chat_histories(self):
         self.gemini_chat = None
         if self.mistral_chat_history: # Проверяем, есть ли что очищать
@@ -88,6 +96,7 @@ class UserData:
         self.reset_chat_histories()
         if self.session_start_timestamp is not None:
             self.session_start_timestamp = None
+            self.session_deadline_monotonic = None
             changed = True
         self.clear_flux_data()
         self.clear_custom_donation_prompt()
@@ -104,6 +113,8 @@ class UserData:
 
 
 user_data_store: Dict[int, UserData] = {}
+# Доверенные пользователи, для которых блокировка в БД уже проверена с момента последнего block_user_db
+_trusted_block_checked: Set[int] = set()
 
 def _init_db():
     try:
@@ -185,6 +196,7 @@ def get_all_trusted_users_db() -> Set[int]:
         return set()
 
 def block_user_db(user_id: int, blocked_until: Optional[datetime], violations: int):
+    _trusted_block_checked.discard(user_id)
     blocked_until_iso = blocked_until.isoformat() if blocked_until else None
     try:
         with sqlite3.connect(DB_FILE_PATH, check_same_thread=False) as conn:
@@ -283,10 +295,13 @@ def check_and_unblock_if_trusted(user_id: int, current_trusted_set: Set[int]):
 
 
 def get_user_data(user_id: int) -> UserData:
-    if user_id in user_data_store:
-        # Периодически проверяем, не стал ли пользователь доверенным, пока был в кэше
-        check_and_unblock_if_trusted(user_id, settings.TRUSTED_USERS_SET)
-        return user_data_store[user_id]
+    cached_user_data = user_data_store.get(user_id)
+    if cached_user_data is not None:
+        # Проверяем, не стал ли пользователь доверенным, пока был в кэше (один раз, без запроса к БД на каждый вызов)
+        if user_id in settings.TRUSTED_USERS_SET and user_id not in _trusted_block_checked:
+            check_and_unblock_if_trusted(user_id, settings.TRUSTED_USERS_SET)
+            _trusted_block_checked.add(user_id)
+        return cached_user_data
 
     p_settings = _load_user_persistent_settings_from_db(user_id)
     if not p_settings:
@@ -315,6 +330,7 @@ def get_user_data(user_id: int) -> UserData:
                 logging.info(f"Found expired block for user {user_id} in DB, removing.")
     else: # Пользователь доверенный, убедимся, что он не заблокирован в БД
         unblock_user_db(user_id)
+        _trusted_block_checked.add(user_id)
 
     new_user_data = UserData(**ud_kwargs)
     user_data_store[user_id] = new_user_data
@@ -1,8 +1,11 @@
 # ./core.py
+import atexit
 import logging
 import os
+import queue
+import time
 import uuid
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime, timezone
 import pytz
 from typing import Optional, Dict, Any
@@ -65,7 +68,6 @@ file_handler_core = RotatingFileHandler(
 )
 file_handler_core.setFormatter(file_formatter)
 file_handler_core.addFilter(default_trace_id_filter)
-logger.addHandler(file_handler_core)
 
 try:
     import colorlog
@@ -98,7 +100,13 @@ except ImportError:
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(console_formatter)
 console_handler.addFilter(default_trace_id_filter)
-logger.addHandler(console_handler)
+
+# Запись в файл и консоль выполняется в отдельном потоке, обработчики только кладут запись в очередь
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, file_handler_core, console_handler, respect_handler_level=True)
+logger.addHandler(QueueHandler(log_queue))
+log_listener.start()
+atexit.register(log_listener.stop)
 
 
 class TraceIdAdapter(logging.LoggerAdapter):
@@ -128,6 +136,7 @@ bot = telebot.TeleBot(
 
 BOT_START_TIME = datetime.now(timezone.utc)
 bot.BOT_START_TIME_REFERENCE = BOT_START_TIME
+bot.BOT_START_TS = int(BOT_START_TIME.timestamp())
 
 
 @lru_cache(maxsize=1)
@@ -185,13 +194,10 @@ def check_session_expiry_core(user_id: int) -> bool:
         return True
 
     user_s_data = get_user_data(user_id)
-    if not user_s_data.session_start_timestamp:
+    if user_s_data.session_deadline_monotonic is None:
         return True
 
-    now_utc = datetime.now(timezone.utc)
-    session_age_seconds = (now_utc - user_s_data.session_start_timestamp).total_seconds()
-    
-    if session_age_seconds <= settings.SESSION_LIFETIME_MINUTES * 60:
+    if time.monotonic() <= user_s_data.session_deadline_monotonic:
         return True
 
     expiry_logger = get_logger_with_trace_id("SESSION_MGR")
@@ -206,6 +212,7 @@ def check_session_expiry_core(user_id: int) -> bool:
     user_s_data.reset_chat_histories()
     user_s_data.state = BotState.NONE
     user_s_data.session_start_timestamp = None
+    user_s_data.session_deadline_monotonic = None
     return False
 
 
@@ -1,16 +1,17 @@
 import logging
 from datetime import datetime, timezone, timedelta
 from typing import List, Optional
+from zoneinfo import ZoneInfo
 
-import pytz
 import telebot
 from telebot import types, util
+from telebot.apihelper import ApiTelegramException
 from telebot.types import Message, CallbackQuery, InlineKeyboardMarkup
 
 from components.settings_config import settings
-from components.localization import get_translation, LANGUAGES
+from components.localization import get_translation, get_translation_optional, LANGUAGES
 from components.user_data_manager import get_user_data, BotState
-from components.rate_limiter import check_rate_limits, is_user_blocked
+from components.rate_limiter import check_rate_limits, is_user_blocked, count_user_requests_since
 from components.telegram_utils import clean_markdown_text, escape_html_util
 from components.currency_service import (
     get_fiat_rates as get_fiat_rates_cs,
@@ -20,6 +21,15 @@ from components.currency_service import (
     RateFetchingError
 )
 
+_MOSCOW_TZ = ZoneInfo('Europe/Moscow')
+
+_STOP_MODE_EXIT_STATES = frozenset({
+    BotState.GEMINI_MODE, BotState.MISTRAL_MODE,
+    BotState.FLUX_PROMPT, BotState.FLUX_DIMENSIONS,
+    BotState.DONATE_CUSTOM_AMOUNT_INPUT, BotState.WAITING_FOR_FORWARD
+})
+_FLUX_STATES = frozenset({BotState.FLUX_PROMPT, BotState.FLUX_DIMENSIONS})
+
 
 def register_common_handlers(
     bot: telebot.TeleBot,
@@ -27,41 +37,39 @@ def register_common_handlers(
     command_handler_map_ref: dict,
     allowed_commands_when_blocked_list: List[str]
 ):
+    bot_start_ts = bot.BOT_START_TS
+
     def is_message_old(message: Message) -> bool:
-        return (hasattr(bot, 'BOT_START_TIME_REFERENCE') and 
-                message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()))
+        return message.date < bot_start_ts
 
     def safe_send_message(user_id: int, text: str, markdown: bool = True, **kwargs):
         try:
-            parse_mode = "Markdown" if markdown else None
-            return bot.send_message(user_id, text, parse_mode=parse_mode, **kwargs)
-        except telebot.apihelper.ApiTelegramException:
-            if markdown:
-                try:
-                    return bot.send_message(user_id, clean_markdown_text(text), **kwargs)
-                except telebot.apihelper.ApiTelegramException as e:
-                    logging.error(f"Failed to send message to {user_id}: {e}")
-            else:
-                logging.error(f"Failed to send plain message to {user_id}")
-        except Exception as e:
-            logging.error(f"Unexpected error sending message to {user_id}: {e}")
+            return bot.send_message(user_id, text, parse_mode=("Markdown" if markdown else None), **kwargs)
+        except ApiTelegramException as e:
+            if not markdown:
+                logging.error(f"Failed to send plain message to {user_id}: {e}")
+                return None
+            try:
+                return bot.send_message(user_id, clean_markdown_text(text), **kwargs)
+            except ApiTelegramException as e_plain:
+                logging.error(f"Failed to send message to {user_id}: {e_plain}")
 
     def safe_edit_message(chat_id: int, message_id: int, text: str, **kwargs):
         try:
             return bot.edit_message_text(text, chat_id=chat_id, message_id=message_id, **kwargs)
-        except telebot.apihelper.ApiTelegramException as e:
+        except ApiTelegramException as e:
             logging.warning(f"Error editing message {message_id}: {e}")
 
     def safe_answer_callback(call_id: str, text: str = None, **kwargs):
         try:
             return bot.answer_callback_query(call_id, text, **kwargs)
-        except Exception as e:
+        except ApiTelegramException as e:
             logging.warning(f"Error answering callback query: {e}")
 
     def safe_edit_markup(chat_id: int, message_id: int, markup=None):
         try:
             return bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=markup)
-        except Exception:
+        except ApiTelegramException:
             pass
 
     @bot.message_handler(commands=['start'])
@@ -117,11 +125,11 @@ def register_common_handlers(
                     selected_lang=language_code_from_callback.upper()
                 )
                 
-                safe_answer_callback(call.id, language_set_message)
-                safe_edit_message(message_obj.chat.id, message_obj.message_id, language_set_message, reply_markup=None)
-                
                 welcome_message = get_translation(language=user_s_data.language, key='welcome')
-                safe_send_message(user_id, welcome_message)
+                
+                safe_answer_callback(call.id, language_set_message)
+                safe_edit_message(message_obj.chat.id, message_obj.message_id,
+                                  f"{language_set_message}\n\n{welcome_message}", reply_markup=None)
             else:
                 invalid_lang_alert = get_translation(language=user_s_data.language, key='invalid_language_alert')
                 safe_answer_callback(call.id, invalid_lang_alert, show_alert=True)
@@ -138,22 +146,21 @@ def register_common_handlers(
             
             user_id = message.chat.id
             user_s_data = get_user_data(user_id)
-            status_lines = []
+            status_parts = []
             user_is_trusted = user_id in settings.TRUSTED_USERS_SET
             
             if user_is_trusted:
-                status_lines.append(get_translation(language=user_s_data.language, key='trusted_user'))
+                status_parts.append(get_translation(language=user_s_data.language, key='trusted_user'))
             else:
-                now = datetime.now(timezone.utc)
-                day_ago = now - timedelta(hours=24)
-                user_reqs_today = sum(1 for req in user_s_data.requests_timestamps if req > day_ago)
+                day_ago = datetime.now(timezone.utc) - timedelta(hours=24)
+                user_reqs_today = count_user_requests_since(user_s_data, day_ago)
                 
                 limitations_text = get_translation(
                     language=user_s_data.language, 
                     key='not_in_trusted', 
                     _user_violations=user_s_data.violations
                 )
-                status_lines.append(limitations_text)
+                status_parts.append(limitations_text)
                 
                 usage_text = get_translation(
                     language=user_s_data.language, 
@@ -161,25 +168,24 @@ def register_common_handlers(
                     used=user_reqs_today, 
                     limit=settings.MAX_REQUESTS_PER_USER_PER_DAY
                 )
-                status_lines.append(f"\n{usage_text}")
+                status_parts.append(usage_text)
                 
                 if user_s_data.last_rate_request_timestamp:
                     time_since_last_rate = (now - user_s_data.last_rate_request_timestamp).total_seconds()
                     rate_cooldown_total = 60
                     if time_since_last_rate < rate_cooldown_total:
                         seconds_remaining_rate = int(rate_cooldown_total - time_since_last_rate)
-                        if 'user_status_rate_cooldown' in LANGUAGES[user_s_data.language]:
-                            rate_cooldown_info = get_translation(
-                                language=user_s_data.language,
-                                key='user_status_rate_cooldown',
-                                seconds_remaining=seconds_remaining_rate
-                            )
-                            status_lines.append(f"\n{rate_cooldown_info}")
+                        rate_cooldown_info = get_translation_optional(
+                            language=user_s_data.language,
+                            key='user_status_rate_cooldown',
+                            seconds_remaining=seconds_remaining_rate
+                        )
+                        if rate_cooldown_info:
+                            status_parts.append(rate_cooldown_info)
                 
                 if user_s_data.blocked_until_timestamp and now < user_s_data.blocked_until_timestamp:
                     try:
-                        target_tz = pytz.timezone('Europe/Moscow')
-                        blocked_until_local_dt = user_s_data.blocked_until_timestamp.astimezone(target_tz)
+                        blocked_until_local_dt = user_s_data.blocked_until_timestamp.astimezone(_MOSCOW_TZ)
                         blocked_until_local_str = blocked_until_local_dt.strftime('%Y-%m-%d %H:%M:%S %Z')
                     except:
                         blocked_until_local_str = user_s_data.blocked_until_timestamp.strftime('%Y-%m-%d %H:%M:%S %Z')
@@ -189,9 +195,9 @@ def register_common_handlers(
                         key='user_status_blocked_until', 
                         datetime=blocked_until_local_str
                     )
-                    status_lines.append(f"\n{blocked_text}")
+                    status_parts.append(blocked_text)
             
-            safe_send_message(user_id, "\n".join(status_lines))
+            safe_send_message(user_id, "\n\n".join(status_parts))
             user_s_data.state = BotState.NONE
         
         command_handler_map_ref['/user'] = check_user_status_command_handler
@@ -252,6 +258,7 @@ def register_common_handlers(
                 user_s_data.state = BotState.NONE
                 
             elif call.data == "getid_forward":
+                user_s_data.processed_media_group_ids.clear()
                 user_s_data.state = BotState.WAITING_FOR_FORWARD
                 forward_prompt_text = get_translation(language=user_s_data.language, key="forward_prompt_message")
                 if not safe_send_message(user_id, forward_prompt_text):
@@ -268,10 +275,10 @@ def register_common_handlers(
             user_id = message.chat.id
             user_s_data = get_user_data(user_id)
             
-            if message.text and message.text.startswith('/'):
+            txt = message.text
+            if txt and txt[:1] == '/':
                 user_s_data.state = BotState.NONE
-                user_s_data.processed_media_group_ids.clear()
-                command = message.text.split(maxsplit=1)[0].lower()
+                command = txt.split(None, 1)[0].lower()
                 handler_func = command_handler_map_ref.get(command)
                 
                 if handler_func:
@@ -317,7 +324,6 @@ def register_common_handlers(
             if is_forwarded and sender_info_val is not None and sender_id_for_markdown is not None:
                 if not check_rate_limits(user_id, "getid_forward_action"):
                     user_s_data.state = BotState.NONE
-                    user_s_data.processed_media_group_ids.clear()
                     return
                 
                 sender_text = get_translation(
@@ -331,7 +337,6 @@ def register_common_handlers(
                 safe_send_message(user_id, not_forwarded_text, reply_to_message_id=message.message_id, markdown=False)
             
             user_s_data.state = BotState.NONE
-            user_s_data.processed_media_group_ids.clear()
             
             reset_text = get_translation(language=user_s_data.language, key='getid_reset')
             safe_send_message(user_id, reset_text, markdown=False)
@@ -462,21 +467,13 @@ def register_common_handlers(
         message_obj = call.message
         current_state = user_s_data.state
         
-        exit_states = {
-            BotState.GEMINI_MODE, BotState.MISTRAL_MODE,
-            BotState.FLUX_PROMPT, BotState.FLUX_DIMENSIONS,
-            BotState.DONATE_CUSTOM_AMOUNT_INPUT, BotState.WAITING_FOR_FORWARD
-        }
-        
-        if current_state in exit_states:
+        if current_state in _STOP_MODE_EXIT_STATES:
             logging.info(f"User {user_id} exited mode '{current_state.name}' via stop button.")
             
-            if current_state in {BotState.FLUX_PROMPT, BotState.FLUX_DIMENSIONS}:
+            if current_state in _FLUX_STATES:
                 user_s_data.clear_flux_data()
             elif current_state == BotState.DONATE_CUSTOM_AMOUNT_INPUT:
                 user_s_data.clear_custom_donation_prompt()
-            elif current_state == BotState.WAITING_FOR_FORWARD:
-                user_s_data.processed_media_group_ids.clear()
             
             user_s_data.state = BotState.NONE
             safe_edit_markup(message_obj.chat.id, message_obj.message_id, None)
@@ -1,8 +1,11 @@
 # handlers/flux_handlers.py
 import logging
 import os
-from datetime import datetime, timezone
-from typing import List, Dict, Callable, Optional, Any, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from typing import List, Dict, Callable, Optional, Any, Tuple, FrozenSet, NamedTuple
 
 import telebot
 from telebot.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
@@ -19,97 +22,151 @@ from components.flux_service import (
     FluxError
 )
 
+class Dim(NamedTuple):
+    label: str
+    w: int
+    h: int
+    as_document: bool
+
+
 FLUX_DIMENSIONS = (
-    ("768x768", 768, 768),
-    ("1024x1024", 1024, 1024),
-    ("1024x768", 1024, 768),
-    ("768x1024", 768, 1024),
-    ("1600x1200", 1600, 1200),
-    ("1200x1600", 1200, 1600),
-    ("1500x1500", 1500, 1500),
-    ("2048x2048", 2048, 2048)
+    Dim("768x768", 768, 768, False),
+    Dim("1024x1024", 1024, 1024, False),
+    Dim("1024x768", 1024, 768, False),
+    Dim("768x1024", 768, 1024, False),
+    Dim("1600x1200", 1600, 1200, True),
+    Dim("1200x1600", 1200, 1600, True),
+    Dim("1500x1500", 1500, 1500, True),
+    Dim("2048x2048", 2048, 2048, True)
+)
+
+_CAPTION_SUFFIX_MD: Dict[str, str] = {}
+_CAPTION_SUFFIX_PLAIN: Dict[str, str] = {}
+
+_FLUX_DIM_PREFIX = "flux_dim:"
+_FLUX_REENTER = "flux_reenter"
+
+_DIM_BUTTONS = tuple(
+    InlineKeyboardButton(text=dim.label, callback_data=f"{_FLUX_DIM_PREFIX}{i}")
+    for i, dim in enumerate(FLUX_DIMENSIONS)
 )
 
 FLUX_EXCEPTIONS = (FluxClientError, FluxGenerationError, FluxError)
+
+_FLUX_ERR_MAP = {
+    FluxClientError: 'flux_service_unavailable_alert',
+    FluxGenerationError: 'flux_error',
+    FluxError: 'flux_error',
+}
 CAPTION_MAX_LENGTH = 1024
 MESSAGE_DELETE_THRESHOLD = 48 * 3600 - 60
 
+_send_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='flux-send')
+_generation_pool = ThreadPoolExecutor(max_workers=settings.FLUX_MAX_CONCURRENT, thread_name_prefix='flux-gen')
+_in_flight_lock = threading.Lock()
+
+
+def _fresh_only(bot: telebot.TeleBot) -> Callable:
+    start_ts = bot.BOT_START_TS
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(message_or_call, *args, **kwargs):
+            message = message_or_call if hasattr(message_or_call, 'date') else message_or_call.message
+            if message and message.date < start_ts:
+                return
+            return func(message_or_call, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _is_flux_prompt(message: Message) -> bool:
+    message._user_data = get_user_data(message.chat.id)
+    return message._user_data.state == BotState.FLUX_PROMPT
 
-def _is_old_message(bot: telebot.TeleBot, message: Message) -> bool:
-    return (hasattr(bot, 'BOT_START_TIME_REFERENCE') and 
-            message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()))
+
+def _run_background_send(action_func: Callable, *args, **kwargs) -> None:
+    try:
+        action_func(*args, **kwargs)
+    except Exception as e:
+        logging.warning(f"Background Telegram call '{action_func.__name__}' failed: {e}")
+
+
+def _submit_send(action_func: Callable, *args, **kwargs) -> None:
+    _send_pool.submit(_run_background_send, action_func, *args, **kwargs)
 
 
 def _send_error_and_cleanup(bot: telebot.TeleBot, user_id: int, user_data, error_key: str, **kwargs):
     error_msg = get_translation(language=user_data.language, key=error_key, **kwargs)
-    try:
-        bot.send_message(user_id, error_msg, parse_mode="Markdown")
-    except Exception:
-        pass
+    _submit_send(bot.send_message, user_id, error_msg, parse_mode="Markdown")
     user_data.state = BotState.NONE
     user_data.clear_flux_data()
 
 
+@lru_cache(maxsize=32)
 def _create_dimensions_keyboard(language: str) -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardMarkup(row_width=2)
-    buttons = [InlineKeyboardButton(text=dim[0], callback_data=f"flux_dim:{dim[1]}:{dim[2]}") 
-               for dim in FLUX_DIMENSIONS]
-    keyboard.add(*buttons)
+    keyboard.add(*_DIM_BUTTONS)
     
     reenter_text = get_translation(language=language, key='flux_reenter_prompt_button')
     stop_text = get_translation(language=language, key='stop_mode_button')
     keyboard.add(
-        InlineKeyboardButton(reenter_text, callback_data="flux_reenter"),
+        InlineKeyboardButton(reenter_text, callback_data=_FLUX_REENTER),
         InlineKeyboardButton(stop_text, callback_data="stop_mode")
     )
     return keyboard
 
 
-def _create_image_caption(prompt: str, language: str) -> str:
-    escaped_prompt = escape_markdown_v2(prompt)
-    generate_more_text = get_translation(language=language, key='flux_generate_more')
-    caption = f"`{escaped_prompt}`\n\n{generate_more_text}"
-    
-    if len(caption) > CAPTION_MAX_LENGTH:
-        max_prompt_len = CAPTION_MAX_LENGTH - len(generate_more_text) - 10
-        caption = f"`{escaped_prompt[:max_prompt_len]}...`\n\n{generate_more_text}"
+def _caption_suffix(language: str, markdown: bool = True) -> str:
+    cache = _CAPTION_SUFFIX_MD if markdown else _CAPTION_SUFFIX_PLAIN
+    suffix = cache.get(language)
+    if suffix is None:
+        generate_more_text = get_translation(language=language, key='flux_generate_more')
+        _CAPTION_SUFFIX_MD[language] = f"`\n\n{generate_more_text}"
+        _CAPTION_SUFFIX_PLAIN[language] = f"\n\n{generate_more_text}"
+        suffix = cache[language]
+    return suffix
+
+
+def _create_image_caption(escaped_prompt: str, language: str) -> str:
+    suffix = _caption_suffix(language)
+    if len(escaped_prompt) + len(suffix) + 1 <= CAPTION_MAX_LENGTH:
+        return f"`{escaped_prompt}{suffix}"
     
-    return caption
+    max_prompt_len = CAPTION_MAX_LENGTH - len(suffix) - 7
+    return f"`{escaped_prompt[:max_prompt_len]}...{suffix}"
 
 
 def _send_flux_image(bot: telebot.TeleBot, user_id: int, image_path: str, 
-                     prompt: str, width: int, height: int, language: str):
-    caption = _create_image_caption(prompt, language)
+                     prompt: str, escaped_prompt: str, dim: Dim, language: str):
+    caption = _create_image_caption(escaped_prompt, language)
     
-    try:
-        with open(image_path, 'rb') as f:
-            if width > 1024 or height > 1024:
-                bot.send_document(user_id, f, caption=caption, parse_mode="Markdown",
-                                visible_file_name=f"flux_image_{user_id}.png")
-            else:
-                bot.send_photo(user_id, f, caption=caption, parse_mode="Markdown")
-    except telebot.apihelper.ApiTelegramException as e:
-        logging.error(f"Telegram API Error sending FLUX image (Markdown) to {user_id}: {e}. Retrying with plain text.")
-        with open(image_path, 'rb') as f:
-            generate_more_text = get_translation(language=language, key='flux_generate_more')
-            plain_caption = f"{prompt}\n\n{generate_more_text}"
+    def _send(f, caption_text: str, **kwargs):
+        if dim.as_document:
+            bot.send_document(user_id, f, caption=caption_text,
+                              visible_file_name=f"flux_image_{user_id}.png", **kwargs)
+        else:
+            bot.send_photo(user_id, f, caption=caption_text, **kwargs)
+    
+    with open(image_path, 'rb') as f:
+        try:
+            _send(f, caption, parse_mode="Markdown")
+        except telebot.apihelper.ApiTelegramException as e:
+            logging.error(f"Telegram API Error sending FLUX image (Markdown) to {user_id}: {e}. Retrying with plain text.")
+            plain_caption = f"{prompt}{_caption_suffix(language, markdown=False)}"
             if len(plain_caption) > CAPTION_MAX_LENGTH:
                 plain_caption = plain_caption[:CAPTION_MAX_LENGTH-3] + "..."
-            
-            if width > 1024 or height > 1024:
-                bot.send_document(user_id, f, caption=plain_caption,
-                                visible_file_name=f"flux_image_{user_id}.png")
-            else:
-                bot.send_photo(user_id, f, caption=plain_caption)
+            f.seek(0)
+            _send(f, plain_caption)
 
 
 def _handle_command_in_flux_mode(bot: telebot.TeleBot, message: Message, user_data,
-                                command_handler_map: Dict, allowed_commands: List[str]):
+                                command_handler_map: Dict, allowed_commands: FrozenSet[str]):
     current_state = user_data.state.name
     user_data.state = BotState.NONE
     user_data.clear_flux_data()
     
-    command = message.text.split(maxsplit=1)[0].lower()
+    command = message.text.split(None, 1)[0].lower()
     logging.info(f"User {message.chat.id} sent command '{command}' while in {current_state}. Exiting mode.")
     
     handler_func = command_handler_map.get(command)
@@ -123,36 +180,69 @@ def _handle_command_in_flux_mode(bot: telebot.TeleBot, message: Message, user_da
             error_msg = get_translation(language=user_data.language, key='error_executing_command', command=command)
             try:
                 bot.send_message(message.chat.id, error_msg)
-            except Exception:
+            except telebot.apihelper.ApiTelegramException:
                 pass
     else:
         logging.warning(f"User {message.chat.id} sent unknown command '{command}' in FLUX_PROMPT state.")
         try:
             exit_msg = get_translation(language=user_data.language, key='mode_exited')
             bot.send_message(message.chat.id, exit_msg)
-        except Exception:
+        except telebot.apihelper.ApiTelegramException:
             pass
 
 
-def _cleanup_temp_file(file_path: str):
-    if file_path and os.path.exists(file_path):
+def _report_flux_error(bot: telebot.TeleBot, user_id: int, language: str, error: Exception,
+                       status_message_obj: Optional[Message]) -> bool:
+    key = _FLUX_ERR_MAP.get(type(error))
+    if key is None and isinstance(error, FLUX_EXCEPTIONS):
+        key = 'flux_error'
+    
+    if key is not None:
+        logging.error(f"FLUX Service Error for user {user_id}: {error}")
+        if isinstance(error, FluxGenerationError):
+            error_msg = get_translation(language=language, key=key, 
+                                      error=escape_markdown_v2(str(error)))
+        elif key == 'flux_error':
+            error_msg = get_translation(language=language, key=key, 
+                                        error="An error occurred with image generation.")
+        else:
+            error_msg = get_translation(language=language, key=key)
+    else:
+        logging.error(f"General unhandled error in FLUX generation for user {user_id}: {error}", exc_info=error)
+        error_msg = get_translation(language=language, key='flux_error', 
+                                    error="An unexpected error occurred.")
+    
+    if status_message_obj:
         try:
-            os.remove(file_path)
-        except OSError as e:
-            logging.error(f"Error removing temporary FLUX image file {file_path}: {e}")
+            bot.edit_message_text(error_msg, chat_id=user_id, 
+                                message_id=status_message_obj.message_id, parse_mode="Markdown")
+            return True
+        except telebot.apihelper.ApiTelegramException:
+            pass
+    try:
+        bot.send_message(user_id, error_msg, parse_mode="Markdown")
+    except telebot.apihelper.ApiTelegramException as e_send:
+        logging.error(f"Failed to report FLUX error to user {user_id}: {e_send}")
+    return False
+
+
+def _cleanup_temp_file(file_path: str):
+    if not file_path:
+        return
+    try:
+        os.unlink(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.error(f"Error removing temporary FLUX image file {file_path}: {e}")
 
 
 def _safe_delete_message(bot: telebot.TeleBot, user_id: int, message_obj):
     if not message_obj:
         return
     
-    try:
-        time_diff = (datetime.now(timezone.utc) - 
-                    datetime.fromtimestamp(message_obj.date, tz=timezone.utc)).total_seconds()
-        if time_diff < MESSAGE_DELETE_THRESHOLD:
-            bot.delete_message(user_id, message_obj.message_id)
-    except Exception:
-        pass
+    if time.time() - message_obj.date < MESSAGE_DELETE_THRESHOLD:
+        _submit_send(bot.delete_message, user_id, message_obj.message_id)
 
 
 def register_flux_handlers(
@@ -173,12 +263,13 @@ def register_flux_handlers(
                        f"(HF_API_KEY: {bool(settings.HF_API_KEY)}, hf_client: {bool(hf_client_ref)})")
         return
 
+    _allowed = frozenset(allowed_commands_when_blocked_list)
+    fresh_only = _fresh_only(bot)
+
     @bot.message_handler(commands=['flux'])
+    @fresh_only
     @block_checked_decorator
     def start_flux_mode_command_handler(message: Message) -> None:
-        if _is_old_message(bot, message):
-            return
-        
         user_id = message.chat.id
         user_data = get_user_data(user_id)
         
@@ -196,16 +287,14 @@ def register_flux_handlers(
         except telebot.apihelper.ApiTelegramException as e:
             logging.error(f"Failed to send flux mode entry message to {user_id}: {e}")
 
-    command_handler_map_ref['/flux'] = start_flux_mode_command_handler
+    command_handler_map_ref["/flux"] = start_flux_mode_command_handler
 
-    @bot.message_handler(func=lambda message: get_user_data(message.chat.id).state == BotState.FLUX_PROMPT)
+    @bot.message_handler(func=_is_flux_prompt)
+    @fresh_only
     @block_checked_decorator
     def handle_flux_prompt_message_handler(message: Message) -> None:
-        if _is_old_message(bot, message):
-            return
-        
         user_id = message.chat.id
-        user_data = get_user_data(user_id)
+        user_data = getattr(message, '_user_data', None) or get_user_data(user_id)
         
         if not hf_client_ref:
             _send_error_and_cleanup(bot, user_id, user_data, 'flux_service_unavailable_alert')
@@ -213,29 +302,23 @@ def register_flux_handlers(
         
         if message.text and message.text.startswith('/'):
             _handle_command_in_flux_mode(bot, message, user_data, command_handler_map_ref, 
-                                       allowed_commands_when_blocked_list)
+                                       _allowed)
             return
         
         if not message.text:
             prompt_needed_msg = get_translation(language=user_data.language, key='flux_prompt_needed')
-            try:
-                bot.send_message(user_id, prompt_needed_msg, 
-                               reply_markup=get_main_stop_keyboard_func(user_id))
-            except Exception:
-                pass
+            _submit_send(bot.send_message, user_id, prompt_needed_msg,
+                         reply_markup=get_main_stop_keyboard_func(user_id))
             return
         
         prompt = message.text.strip()
         if not prompt:
             prompt_needed_msg = get_translation(language=user_data.language, key='flux_prompt_needed')
-            try:
-                bot.send_message(user_id, prompt_needed_msg, 
-                               reply_markup=get_main_stop_keyboard_func(user_id))
-            except Exception:
-                pass
+            _submit_send(bot.send_message, user_id, prompt_needed_msg,
+                         reply_markup=get_main_stop_keyboard_func(user_id))
             return
         
-        user_data.flux_data = {"prompt": prompt}
+        user_data.flux_data = {"prompt": prompt, "escaped": escape_markdown_v2(prompt)}
         user_data.state = BotState.FLUX_DIMENSIONS
         
         keyboard = _create_dimensions_keyboard(user_data.language)
@@ -243,11 +326,11 @@ def register_flux_handlers(
         
         try:
             bot.send_message(user_id, dimensions_prompt_text, reply_markup=keyboard)
-        except Exception:
+        except telebot.apihelper.ApiTelegramException:
             user_data.state = BotState.NONE
             user_data.clear_flux_data()
 
-    @bot.callback_query_handler(func=lambda call: call.data == "flux_reenter")
+    @bot.callback_query_handler(func=lambda call, _r=_FLUX_REENTER: call.data == _r)
     @block_checked_decorator
     def handle_flux_reenter_callback_handler(call: CallbackQuery) -> None:
         user_id = call.from_user.id
@@ -258,7 +341,7 @@ def register_flux_handlers(
             bot.edit_message_reply_markup(chat_id=call.message.chat.id, 
                                         message_id=call.message.message_id, 
                                         reply_markup=None)
-        except Exception:
+        except telebot.apihelper.ApiTelegramException:
             pass
         
         user_data.state = BotState.FLUX_PROMPT
@@ -269,157 +352,116 @@ def register_flux_handlers(
             bot.send_message(user_id, flux_mode_message, 
                            reply_markup=get_main_stop_keyboard_func(user_id), 
                            parse_mode="Markdown")
-        except Exception:
+        except telebot.apihelper.ApiTelegramException:
             user_data.state = BotState.NONE
 
-    @bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("flux_dim:"))
+    @bot.callback_query_handler(func=lambda call, _p=_FLUX_DIM_PREFIX: (call.data or '').startswith(_p))
     @block_checked_decorator
     def handle_flux_dimensions_callback_handler(call: CallbackQuery) -> None:
         user_id = call.from_user.id
         user_data = get_user_data(user_id)
         message_obj = call.message
         
-        if not check_rate_limits(user_id, "flux"):
-            rate_limit_msg = get_translation(language=user_data.language, key='rate_limit_alert')
+        alert_key = None
+        current_flux_data = user_data.flux_data
+        # Повторное нажатие во время генерации не должно расходовать лимит запросов
+        with _in_flight_lock:
+            if user_data.flux_in_flight:
+                alert_key = 'flux_already_generating_alert'
+            else:
+                user_data.flux_in_flight = True
+        
+        if alert_key is None:
+            if not check_rate_limits(user_id, "flux"):
+                alert_key = 'rate_limit_alert'
+            elif not hf_client_ref:
+                alert_key = 'flux_service_unavailable_alert'
+            elif not current_flux_data or "prompt" not in current_flux_data:
+                alert_key = 'flux_session_expired_alert'
+            else:
+                try:
+                    dim_index = int(call.data[len(_FLUX_DIM_PREFIX):])
+                except ValueError:
+                    dim_index = -1
+                if 0 <= dim_index < len(FLUX_DIMENSIONS):
+                    dim = FLUX_DIMENSIONS[dim_index]
+                else:
+                    alert_key = 'flux_generation_failed'
+            if alert_key is not None:
+                user_data.flux_in_flight = False
+        
+        if alert_key is not None:
+            if alert_key not in ('rate_limit_alert', 'flux_already_generating_alert'):
+                user_data.state = BotState.NONE
+                user_data.clear_flux_data()
+            alert_msg = get_translation(language=user_data.language, key=alert_key)
             try:
-                bot.answer_callback_query(call.id, rate_limit_msg, show_alert=True)
-            except Exception:
+                bot.answer_callback_query(call.id, alert_msg, show_alert=True)
+            except telebot.apihelper.ApiTelegramException:
                 pass
             return
         
         status_message_obj = None
-        generated_image_path = None
+        handed_off = False
+        error_shown_in_status = False
         original_chat_id = message_obj.chat.id
         original_message_id = message_obj.message_id
+        prompt = current_flux_data["prompt"]
+        escaped_prompt = current_flux_data.get("escaped") or escape_markdown_v2(prompt)
         
         try:
-            try:
-                bot.edit_message_reply_markup(chat_id=original_chat_id, 
-                                            message_id=original_message_id, 
-                                            reply_markup=None)
-            except Exception:
-                pass
-            
-            if not hf_client_ref:
-                unavailable_msg = get_translation(language=user_data.language, key='flux_service_unavailable_alert')
-                try:
-                    bot.answer_callback_query(call.id, unavailable_msg, show_alert=True)
-                except Exception:
-                    pass
-                user_data.state = BotState.NONE
-                user_data.clear_flux_data()
-                try:
-                    failed_msg = get_translation(language=user_data.language, key='flux_generation_failed')
-                    bot.edit_message_text(failed_msg, chat_id=original_chat_id, 
-                                        message_id=original_message_id, reply_markup=None)
-                except Exception:
-                    pass
-                return
-            
-            current_flux_data = user_data.flux_data
-            if not current_flux_data or "prompt" not in current_flux_data:
-                expired_msg = get_translation(language=user_data.language, key='flux_session_expired_alert')
-                try:
-                    bot.answer_callback_query(call.id, expired_msg, show_alert=True)
-                except Exception:
-                    pass
-                user_data.state = BotState.NONE
-                user_data.clear_flux_data()
-                try:
-                    failed_msg = get_translation(language=user_data.language, key='flux_generation_failed') + " (Session Data Lost)"
-                    bot.edit_message_text(failed_msg, chat_id=original_chat_id, 
-                                        message_id=original_message_id, reply_markup=None)
-                except Exception:
-                    pass
-                return
-            
-            prompt = current_flux_data["prompt"]
-            
-            try:
-                _, width_str, height_str = call.data.split(":")
-                width, height = int(width_str), int(height_str)
-                if width <= 0 or height <= 0:
-                    raise ValueError("Dimensions must be positive")
-            except Exception:
-                try:
-                    bot.answer_callback_query(call.id, "Invalid dimension selection.", show_alert=True)
-                except Exception:
-                    pass
-                user_data.state = BotState.NONE
-                user_data.clear_flux_data()
-                try:
-                    failed_msg = get_translation(language=user_data.language, key='flux_generation_failed') + " (Invalid Dimension Data)"
-                    bot.edit_message_text(failed_msg, chat_id=original_chat_id, 
-                                        message_id=original_message_id, reply_markup=None)
-                except Exception:
-                    pass
-                return
-            
             try:
                 bot.answer_callback_query(call.id)
-            except Exception:
-                pass
-            
-            selected_dimensions_text = get_translation(language=user_data.language, 
-                                                     key='flux_selected_dim_confirm', 
-                                                     width=width, height=height)
-            try:
-                bot.edit_message_text(selected_dimensions_text, chat_id=original_chat_id, 
-                                    message_id=original_message_id, reply_markup=None)
-            except Exception:
+            except telebot.apihelper.ApiTelegramException:
                 pass
             
-            generating_message_text = get_translation(language=user_data.language, key='flux_generating')
+            generating_message_text = get_translation(language=user_data.language, 
+                                                      key='flux_selected_and_generating', 
+                                                      width=dim.w, height=dim.h)
             try:
-                status_message_obj = bot.send_message(user_id, generating_message_text, parse_mode="Markdown")
-            except Exception:
+                edited = bot.edit_message_text(generating_message_text, chat_id=original_chat_id, 
+                                               message_id=original_message_id, reply_markup=None,
+                                               parse_mode="Markdown")
+                status_message_obj = edited if isinstance(edited, Message) else None
+            except telebot.apihelper.ApiTelegramException:
                 status_message_obj = None
             
-            generated_image_path = generate_image_with_flux(hf_client=hf_client_ref, 
-                                                          prompt=prompt, width=width, height=height)
-            
-            _send_flux_image(bot, user_id, generated_image_path, prompt, width, height, user_data.language)
-            logging.info(f"Sent FLUX image to user {user_id}. Path: {generated_image_path}")
-            
-        except FLUX_EXCEPTIONS as e:
-            logging.error(f"FLUX Service Error for user {user_id}: {e}")
+            def _on_generation_done(future) -> None:
+                generated_image_path = None
+                error_shown_in_status = False
+                try:
+                    generated_image_path = future.result()
+                    _send_flux_image(bot, user_id, generated_image_path, prompt, escaped_prompt,
+                                     dim, user_data.language)
+                    logging.info(f"Sent FLUX image to user {user_id}. Path: {generated_image_path}")
+                except Exception as e:
+                    error_shown_in_status = _report_flux_error(bot, user_id, user_data.language, e,
+                                                               status_message_obj)
+                finally:
+                    user_data.flux_in_flight = False
+                    # За время генерации пользователь мог перейти в другой режим - его не сбрасываем
+                    if user_data.state == BotState.FLUX_DIMENSIONS:
+                        user_data.state = BotState.NONE
+                        user_data.clear_flux_data()
+                    # Статусное сообщение с текстом ошибки оставляем пользователю
+                    if not error_shown_in_status:
+                        _safe_delete_message(bot, user_id, status_message_obj)
+                    _cleanup_temp_file(generated_image_path)
             
-            if isinstance(e, FluxClientError):
-                error_msg = get_translation(language=user_data.language, key='flux_service_unavailable_alert')
-            elif isinstance(e, FluxGenerationError):
-                error_msg = get_translation(language=user_data.language, key='flux_error', 
-                                          error=escape_markdown_v2(str(e)))
-            else:
-                error_msg = get_translation(language=user_data.language, key='flux_error', 
-                                          error="An error occurred with image generation.")
+            future = _generation_pool.submit(generate_image_with_flux, hf_client=hf_client_ref,
+                                             prompt=prompt, width=dim.w, height=dim.h)
+            future.add_done_callback(_on_generation_done)
+            handed_off = True
             
-            if status_message_obj:
-                try:
-                    bot.edit_message_text(error_msg, chat_id=user_id, 
-                                        message_id=status_message_obj.message_id, parse_mode="Markdown")
-                except Exception:
-                    bot.send_message(user_id, error_msg, parse_mode="Markdown")
-            else:
-                bot.send_message(user_id, error_msg, parse_mode="Markdown")
-                
         except Exception as e:
-            logging.error(f"General unhandled error in handle_flux_dimensions_callback for user {user_id}: {e}", exc_info=True)
-            error_msg = get_translation(language=user_data.language, key='flux_error', 
-                                      error="An unexpected error occurred.")
-            
-            if status_message_obj:
-                try:
-                    bot.edit_message_text(error_msg, chat_id=user_id, 
-                                        message_id=status_message_obj.message_id, parse_mode="Markdown")
-                except Exception:
-                    bot.send_message(user_id, error_msg, parse_mode="Markdown")
-            else:
-                bot.send_message(user_id, error_msg, parse_mode="Markdown")
+            error_shown_in_status = _report_flux_error(bot, user_id, user_data.language, e, status_message_obj)
                 
         finally:
-            user_data.state = BotState.NONE
-            user_data.clear_flux_data()
-            _safe_delete_message(bot, user_id, status_message_obj)
-            _cleanup_temp_file(generated_image_path)
+            if not handed_off:
+                user_data.flux_in_flight = False
+                user_data.state = BotState.NONE
+                user_data.clear_flux_data()
+                if not error_shown_in_status:
+                    _safe_delete_message(bot, user_id, status_message_obj)
 
     logging.info("Flux handlers registered.")
\ No newline at end of file
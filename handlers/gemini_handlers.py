@@ -1,8 +1,10 @@
 # handlers/gemini_handlers.py
 import logging
 import re
-from datetime import datetime, timezone
-from typing import List, Dict, Callable, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import List, Dict, Callable, Optional, Set
 
 import telebot
 from telebot import types
@@ -15,18 +17,95 @@ from components.rate_limiter import is_user_blocked, check_rate_limits
 from components.telegram_utils import (
     send_message_splitted,
     clean_markdown_text,
-    escape_markdown_v2,
     extract_code_blocks,
-    send_code_snippets
+    send_code_snippets,
+    send_code_documents,
+    RateLimitedBot
 )
 from components.gemini_service import (
     initialize_model as init_gemini_model,
     start_new_chat as start_gemini_chat,
-    send_message_to_gemini,
+    stream_message_to_gemini,
     GeminiBlockedPromptError,
     GeminiChatError
 )
 
+_CMD_RE = re.compile(r'^/([A-Za-z0-9_]+)(?:@\w+)?(?:\s|$)')
+_MODEL_SET = frozenset(AVAILABLE_MODELS)
+_GEMINI_PREFIX = "gemini:"
+_GEMINI_PREFIX_LEN = len(_GEMINI_PREFIX)
+_SETMODEL_PREFIX = "set_model:"
+_SETMODEL_PREFIX_LEN = len(_SETMODEL_PREFIX)
+_STREAM_EDIT_MIN_CHARS = 200
+_STREAM_EDIT_INTERVAL = 1.0
+
+_gemini_pool = ThreadPoolExecutor(max_workers=settings.GEMINI_MAX_CONCURRENT, thread_name_prefix='gemini')
+_GEMINI_MAX_PENDING = settings.GEMINI_MAX_CONCURRENT * 2
+_gemini_pending = 0
+_gemini_pending_lock = threading.Lock()
+_GEMINI_BUSY_USERS: Set[int] = set()
+_GEMINI_MODE_USERS: Set[int] = set()
+
+_MENU_STRING_KEYS = ('change_model_button', 'new_chat_button', 'back_button')
+_MENU_STRINGS: Dict[str, Dict[str, str]] = {}
+_MAIN_MENU_CACHE: Dict[str, InlineKeyboardMarkup] = {}
+_MODEL_MENU_CACHE: Dict[str, InlineKeyboardMarkup] = {}
+
+
+def _get_menu_strings(language: str) -> Dict[str, str]:
+    menu_strings = _MENU_STRINGS.get(language)
+    if menu_strings is None:
+        menu_strings = {key: get_translation(language=language, key=key) for key in _MENU_STRING_KEYS}
+        _MENU_STRINGS[language] = menu_strings
+    return menu_strings
+
+
+def _try_reserve_gemini_slot() -> bool:
+    global _gemini_pending
+    with _gemini_pending_lock:
+        if _gemini_pending >= _GEMINI_MAX_PENDING:
+            return False
+        _gemini_pending += 1
+        return True
+
+
+def _release_gemini_slot(_future=None) -> None:
+    global _gemini_pending
+    with _gemini_pending_lock:
+        _gemini_pending -= 1
+
+
+def _try_begin_user_turn(user_id: int) -> bool:
+    with _gemini_pending_lock:
+        if user_id in _GEMINI_BUSY_USERS:
+            return False
+        _GEMINI_BUSY_USERS.add(user_id)
+        return True
+
+
+def _end_user_turn(user_id: int) -> None:
+    with _gemini_pending_lock:
+        _GEMINI_BUSY_USERS.discard(user_id)
+
+
+def _set_state(user_s_data, state: BotState) -> None:
+    user_s_data.state = state
+    if state == BotState.GEMINI_MODE:
+        _GEMINI_MODE_USERS.add(user_s_data.user_id)
+    else:
+        _GEMINI_MODE_USERS.discard(user_s_data.user_id)
+
+
+def _in_gemini_mode(message: Message) -> bool:
+    chat_id = message.chat.id
+    if chat_id not in _GEMINI_MODE_USERS:
+        return False
+    if get_user_data(chat_id).state == BotState.GEMINI_MODE:
+        return True
+    _GEMINI_MODE_USERS.discard(chat_id)
+    return False
+
+
 def register_gemini_handlers(
     bot: telebot.TeleBot,
     block_checked_decorator: Callable,
@@ -42,120 +121,168 @@ def register_gemini_handlers(
         logging.warning("GEMINI_API_KEY is not set. Gemini handlers will not be registered even if feature is enabled.")
         return
 
+    rl_bot = RateLimitedBot(bot)
+    _bot_start_ts = bot.BOT_START_TS
+
+    def _stale(message: Message) -> bool:
+        return message.date < _bot_start_ts
+
+    def _safe_send(chat_id, text: str, **kwargs) -> Optional[Message]:
+        try:
+            return rl_bot.send_message(chat_id, text, **kwargs)
+        except telebot.apihelper.ApiTelegramException as e_send:
+            logging.warning(f"Failed to send message to {chat_id}: {e_send}")
+            return None
+
+    def _safe_edit(text: str, *args, **kwargs) -> bool:
+        try:
+            rl_bot.edit_message_text(text, *args, **kwargs)
+            return True
+        except telebot.apihelper.ApiTelegramException as e_edit:
+            logging.warning(f"Failed to edit message: {e_edit}")
+            return False
+
+    def _safe_delete(*args, **kwargs) -> None:
+        try:
+            rl_bot.delete_message(*args, **kwargs)
+        except telebot.apihelper.ApiTelegramException as e_delete:
+            logging.debug(f"Failed to delete message: {e_delete}")
+
+    def _safe_answer_cb(call_id: str, *args, **kwargs) -> None:
+        try:
+            bot.answer_callback_query(call_id, *args, **kwargs)
+        except telebot.apihelper.ApiTelegramException as e_answer:
+            logging.debug(f"Failed to answer callback query {call_id}: {e_answer}")
+
+    def _stream_gemini_reply(user_id: int, chat_session, prompt_text: str,
+                             processing_msg: Optional[Message],
+                             cancel_event: Optional[threading.Event] = None) -> str:
+        parts: List[str] = []
+        length = 0
+        shown_length = 0
+        last_edit = time.monotonic()
+        for chunk_text in stream_message_to_gemini(chat_session, prompt_text):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            parts.append(chunk_text)
+            length += len(chunk_text)
+            if (processing_msg and length - shown_length >= _STREAM_EDIT_MIN_CHARS
+                    and length <= settings.TELEGRAM_MAX_LENGTH
+                    and time.monotonic() - last_edit >= _STREAM_EDIT_INTERVAL):
+                # После таймаута сообщение уже содержит ошибку - не перезаписываем его
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                _safe_edit(clean_markdown_text("".join(parts)), user_id, processing_msg.message_id)
+                shown_length = length
+                last_edit = time.monotonic()
+        return "".join(parts)
+
     def get_gemini_main_menu_keyboard_local(user_id: int) -> InlineKeyboardMarkup:
-        user_s_data = get_user_data(user_id)
-        keyboard = InlineKeyboardMarkup(row_width=1)
-        change_model_text = get_translation(language=user_s_data.language, key='change_model_button')
-        new_chat_text = get_translation(language=user_s_data.language, key='new_chat_button')
-        keyboard.add(types.InlineKeyboardButton(change_model_text, callback_data="gemini:model"))
-        keyboard.add(types.InlineKeyboardButton(new_chat_text, callback_data="gemini:newchat"))
+        language = get_user_data(user_id).language
+        keyboard = _MAIN_MENU_CACHE.get(language)
+        if keyboard is None:
+            menu_strings = _get_menu_strings(language)
+            keyboard = InlineKeyboardMarkup(row_width=1)
+            keyboard.add(types.InlineKeyboardButton(menu_strings['change_model_button'], callback_data="gemini:model"))
+            keyboard.add(types.InlineKeyboardButton(menu_strings['new_chat_button'], callback_data="gemini:newchat"))
+            _MAIN_MENU_CACHE[language] = keyboard
         return keyboard
 
     def get_gemini_model_selection_keyboard_local(user_id: int) -> InlineKeyboardMarkup:
-        user_s_data = get_user_data(user_id)
-        keyboard = InlineKeyboardMarkup(row_width=1)
-        for model_name_iter in AVAILABLE_MODELS:
-            keyboard.add(types.InlineKeyboardButton(text=model_name_iter, callback_data=f"set_model:{model_name_iter}"))
-        back_button_text = get_translation(language=user_s_data.language, key='back_button')
-        keyboard.add(types.InlineKeyboardButton(text=back_button_text, callback_data="gemini_menu_back"))
+        language = get_user_data(user_id).language
+        keyboard = _MODEL_MENU_CACHE.get(language)
+        if keyboard is None:
+            menu_strings = _get_menu_strings(language)
+            keyboard = InlineKeyboardMarkup(row_width=1)
+            for model_name_iter in AVAILABLE_MODELS:
+                keyboard.add(types.InlineKeyboardButton(text=model_name_iter, callback_data=f"set_model:{model_name_iter}"))
+            keyboard.add(types.InlineKeyboardButton(text=menu_strings['back_button'], callback_data="gemini_menu_back"))
+            _MODEL_MENU_CACHE[language] = keyboard
         return keyboard
 
+    def _ensure_gemini_session(user_id: int, user_s_data, force_new: bool = False,
+                               error_key: Optional[str] = None) -> bool:
+        if not force_new and user_s_data.gemini_chat and check_session_expiry_func(user_id):
+            return True
+        if force_new:
+            user_s_data.gemini_chat = None
+        model_instance = init_gemini_model(user_s_data.gemini_model)
+        chat_session = start_gemini_chat(model_instance) if model_instance else None
+        if chat_session:
+            user_s_data.gemini_chat = chat_session
+            user_s_data.start_session()
+            logging.info(f"Started new Gemini session for {user_id} with model {user_s_data.gemini_model}.")
+            return True
+        if model_instance:
+            error_msg = get_translation(language=user_s_data.language, key=error_key or 'error_start_new_gemini', error="Could not start chat session.")
+        else:
+            error_msg = get_translation(language=user_s_data.language, key=error_key or 'error_init_gemini', error="Could not initialize model.")
+        _safe_send(user_id, error_msg)
+        _set_state(user_s_data, BotState.NONE)
+        return False
+
     @bot.message_handler(commands=['gemini_menu'])
     @block_checked_decorator
     def show_gemini_menu_handler(message: Message) -> None:
-        if hasattr(bot, 'BOT_START_TIME_REFERENCE') and message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()):
+        if _stale(message):
             return
         user_id = message.chat.id
         user_s_data = get_user_data(user_id)
         keyboard = get_gemini_main_menu_keyboard_local(user_id)
         gemini_menu_title = get_translation(language=user_s_data.language, key='gemini_menu_title')
-        try:
-            bot.send_message(user_id, gemini_menu_title, reply_markup=keyboard)
-        except telebot.apihelper.ApiTelegramException as e_send:
-            logging.error(f"Error sending gemini menu message to {user_id}: {e_send}")
-        user_s_data.state = BotState.NONE
+        _safe_send(user_id, gemini_menu_title, reply_markup=keyboard)
+        _set_state(user_s_data, BotState.NONE)
     command_handler_map_ref['/gemini_menu'] = show_gemini_menu_handler
 
     @bot.message_handler(commands=['model'])
     @block_checked_decorator
     def set_gemini_model_command_handler(message: Message) -> None:
-        if hasattr(bot, 'BOT_START_TIME_REFERENCE') and message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()):
+        if _stale(message):
             return
         user_id = message.chat.id
         user_s_data = get_user_data(user_id)
         keyboard = get_gemini_model_selection_keyboard_local(user_id)
         select_model_message = get_translation(language=user_s_data.language, key='select_model')
-        try:
-            bot.send_message(user_id, select_model_message, reply_markup=keyboard)
-        except telebot.apihelper.ApiTelegramException as e_send:
-            logging.error(f"Error sending gemini model selection message to {user_id}: {e_send}")
-        user_s_data.state = BotState.NONE
+        _safe_send(user_id, select_model_message, reply_markup=keyboard)
+        _set_state(user_s_data, BotState.NONE)
     command_handler_map_ref['/model'] = set_gemini_model_command_handler
 
-    @bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("gemini:"))
+    def _handle_model_action(call: CallbackQuery, user_s_data, message_obj: Message) -> None:
+        keyboard = get_gemini_model_selection_keyboard_local(user_s_data.user_id)
+        select_model_message = get_translation(language=user_s_data.language, key='select_model')
+        if not _safe_edit(select_model_message, chat_id=message_obj.chat.id, message_id=message_obj.message_id, reply_markup=keyboard):
+            if _safe_send(message_obj.chat.id, select_model_message, reply_markup=keyboard):
+                _safe_delete(chat_id=message_obj.chat.id, message_id=message_obj.message_id)
+
+    def _handle_newchat_action(call: CallbackQuery, user_s_data, message_obj: Message) -> None:
+        user_id = user_s_data.user_id
+        if not settings.GEMINI_API_KEY:
+            error_msg = get_translation(language=user_s_data.language, key='error_init_gemini', error="API key not configured")
+            _safe_send(user_id, error_msg)
+            return
+        if not _ensure_gemini_session(user_id, user_s_data, force_new=True):
+            _safe_delete(chat_id=message_obj.chat.id, message_id=message_obj.message_id)
+            return
+        new_chat_message = get_translation(language=user_s_data.language, key='new_chat')
+        if not _safe_edit(new_chat_message, chat_id=message_obj.chat.id, message_id=message_obj.message_id, reply_markup=None):
+            _safe_send(message_obj.chat.id, new_chat_message)
+        _set_state(user_s_data, BotState.GEMINI_MODE)
+        gemini_mode_message = get_translation(language=user_s_data.language, key='gemini_mode', model=user_s_data.gemini_model)
+        _safe_send(message_obj.chat.id, gemini_mode_message, reply_markup=get_main_stop_keyboard_func(user_id))
+
+    _ACTION_DISPATCH = {
+        "model": _handle_model_action,
+        "newchat": _handle_newchat_action,
+    }
+
+    @bot.callback_query_handler(func=lambda call: call.data and call.data.startswith(_GEMINI_PREFIX))
     @block_checked_decorator
     def gemini_menu_callback_handler(call: CallbackQuery) -> None:
-        user_id = call.from_user.id
-        user_s_data = get_user_data(user_id)
-        message_obj = call.message
-        action = call.data.split(":", 1)[1]
-        try:
-            bot.answer_callback_query(call.id)
-        except telebot.apihelper.ApiTelegramException:
-            pass
-        if action == "model":
-            keyboard = get_gemini_model_selection_keyboard_local(user_id)
-            select_model_message = get_translation(language=user_s_data.language, key='select_model')
-            try:
-                 bot.edit_message_text(select_model_message, chat_id=message_obj.chat.id, message_id=message_obj.message_id, reply_markup=keyboard)
-            except telebot.apihelper.ApiTelegramException as e_edit:
-                 logging.warning(f"Error editing message for gemini:model callback: {e_edit}. Sending new message.")
-                 try:
-                    bot.send_message(message_obj.chat.id, select_model_message, reply_markup=keyboard)
-                    try:
-                        bot.delete_message(chat_id=message_obj.chat.id, message_id=message_obj.message_id)
-                    except telebot.apihelper.ApiTelegramException:
-                        pass
-                 except telebot.apihelper.ApiTelegramException as e_send:
-                     logging.error(f"Failed to send gemini model selection as new message: {e_send}")
-        elif action == "newchat":
-            if not settings.GEMINI_API_KEY:
-                error_msg = get_translation(language=user_s_data.language, key='error_init_gemini', error="API key not configured")
-                try:
-                    bot.send_message(user_id, error_msg)
-                except telebot.apihelper.ApiTelegramException:
-                    pass
-                return
-            user_s_data.gemini_chat = None
-            model_instance = init_gemini_model(user_s_data.gemini_model)
-            if model_instance:
-                chat_session = start_gemini_chat(model_instance)
-                if chat_session:
-                    user_s_data.gemini_chat = chat_session
-                    user_s_data.session_start_timestamp = datetime.now(timezone.utc)
-                    new_chat_message = get_translation(language=user_s_data.language, key='new_chat')
-                    bot.send_message(message_obj.chat.id, new_chat_message)
-                    user_s_data.state = BotState.GEMINI_MODE
-                    gemini_mode_message = get_translation(language=user_s_data.language, key='gemini_mode', model=user_s_data.gemini_model)
-                    bot.send_message(message_obj.chat.id, gemini_mode_message, reply_markup=get_main_stop_keyboard_func(user_id))
-                else:
-                    error_msg = get_translation(language=user_s_data.language, key='error_start_new_gemini', error="Could not start chat session.")
-                    try:
-                        bot.send_message(user_id, error_msg)
-                    except telebot.apihelper.ApiTelegramException:
-                        pass
-                    user_s_data.state = BotState.NONE
-            else:
-                error_msg = get_translation(language=user_s_data.language, key='error_init_gemini', error="Could not initialize model.")
-                try:
-                    bot.send_message(user_id, error_msg)
-                except telebot.apihelper.ApiTelegramException:
-                    pass
-                user_s_data.state = BotState.NONE
-            try:
-                bot.delete_message(chat_id=message_obj.chat.id, message_id=message_obj.message_id)
-            except telebot.apihelper.ApiTelegramException:
-                pass
+        user_s_data = get_user_data(call.from_user.id)
+        _safe_answer_cb(call.id)
+        action_handler = _ACTION_DISPATCH.get(call.data[_GEMINI_PREFIX_LEN:])
+        if action_handler:
+            action_handler(call, user_s_data, call.message)
 
     @bot.callback_query_handler(func=lambda call: call.data == "gemini_menu_back")
     @block_checked_decorator
@@ -163,174 +290,101 @@ def register_gemini_handlers(
         user_id = call.from_user.id
         user_s_data = get_user_data(user_id)
         message_obj = call.message
-        try:
-            bot.answer_callback_query(call.id)
-        except telebot.apihelper.ApiTelegramException:
-            pass
+        _safe_answer_cb(call.id)
         keyboard = get_gemini_main_menu_keyboard_local(user_id)
         gemini_menu_title = get_translation(language=user_s_data.language, key='gemini_menu_title')
-        try:
-            bot.edit_message_text(gemini_menu_title, chat_id=message_obj.chat.id, message_id=message_obj.message_id, reply_markup=keyboard)
-        except telebot.apihelper.ApiTelegramException as e_edit:
-            logging.warning(f"Error editing message for gemini_menu_back callback: {e_edit}. Sending new message.")
-            try:
-                 bot.send_message(message_obj.chat.id, gemini_menu_title, reply_markup=keyboard)
-            except telebot.apihelper.ApiTelegramException as e_send:
-                 logging.error(f"Failed to send main gemini menu as new message: {e_send}")
+        if not _safe_edit(gemini_menu_title, chat_id=message_obj.chat.id, message_id=message_obj.message_id, reply_markup=keyboard):
+            _safe_send(message_obj.chat.id, gemini_menu_title, reply_markup=keyboard)
 
-    @bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("set_model:"))
+    @bot.callback_query_handler(func=lambda call: call.data and call.data.startswith(_SETMODEL_PREFIX))
     @block_checked_decorator
     def set_model_callback_handler(call: CallbackQuery) -> None:
         user_id = call.from_user.id
         user_s_data = get_user_data(user_id)
         message_obj = call.message
         try:
-            model_name = call.data.split(":", 1)[1]
-            if model_name in AVAILABLE_MODELS:
+            model_name = call.data[_SETMODEL_PREFIX_LEN:]
+            if model_name in _MODEL_SET:
                 user_s_data.gemini_model = model_name
                 logging.info(f"User {user_id} set their Gemini model to {model_name}")
                 model_set_message = get_translation(language=user_s_data.language, key='model_set', model=model_name)
-                bot.answer_callback_query(call.id, model_set_message)
+                _safe_answer_cb(call.id, model_set_message)
                 keyboard = get_gemini_main_menu_keyboard_local(user_id)
                 gemini_menu_title = get_translation(language=user_s_data.language, key='gemini_menu_title')
-                try:
-                     bot.edit_message_text(gemini_menu_title, chat_id=message_obj.chat.id, message_id=message_obj.message_id, reply_markup=keyboard, parse_mode="Markdown")
-                except telebot.apihelper.ApiTelegramException as e_edit:
-                    logging.warning(f"Error editing message to show main menu after set_model callback: {e_edit}. Selection still applied.")
+                _safe_edit(gemini_menu_title, chat_id=message_obj.chat.id, message_id=message_obj.message_id, reply_markup=keyboard)
                 user_s_data.gemini_chat = None
                 logging.debug(f"Cleared Gemini chat history for user {user_id} after model change.")
                 if user_s_data.state == BotState.GEMINI_MODE:
                      gemini_mode_message = get_translation(language=user_s_data.language, key='gemini_mode', model=user_s_data.gemini_model)
-                     try:
-                         bot.send_message(user_id, gemini_mode_message, parse_mode="Markdown", reply_markup=get_main_stop_keyboard_func(user_id))
-                     except telebot.apihelper.ApiTelegramException:
-                         pass
+                     _safe_send(user_id, gemini_mode_message, reply_markup=get_main_stop_keyboard_func(user_id))
             else:
                 invalid_model_message = get_translation(language=user_s_data.language, key='invalid_model')
-                bot.answer_callback_query(call.id, invalid_model_message, show_alert=True)
-                try:
-                    keyboard = get_gemini_model_selection_keyboard_local(user_id)
-                    select_model_message = get_translation(language=user_s_data.language, key='select_model')
-                    bot.edit_message_text(select_model_message, chat_id=message_obj.chat.id, message_id=message_obj.message_id, reply_markup=keyboard)
-                except telebot.apihelper.ApiTelegramException:
-                    pass
+                _safe_answer_cb(call.id, invalid_model_message, show_alert=True)
+                keyboard = get_gemini_model_selection_keyboard_local(user_id)
+                select_model_message = get_translation(language=user_s_data.language, key='select_model')
+                _safe_edit(select_model_message, chat_id=message_obj.chat.id, message_id=message_obj.message_id, reply_markup=keyboard)
         except Exception as e:
             logging.error(f"Error in set_model_callback for user {user_id}: {e}", exc_info=True)
             error_alert = get_translation(language=user_s_data.language, key='error_setting_model_alert')
-            try:
-                bot.answer_callback_query(call.id, error_alert, show_alert=True)
-            except telebot.apihelper.ApiTelegramException:
-                pass
+            _safe_answer_cb(call.id, error_alert, show_alert=True)
 
     @bot.message_handler(commands=['gemini'])
     @block_checked_decorator
     def start_gemini_mode_command_handler(message: Message) -> None:
-        if hasattr(bot, 'BOT_START_TIME_REFERENCE') and message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()):
+        if _stale(message):
             return
         user_id = message.chat.id
         user_s_data = get_user_data(user_id)
         if not settings.GEMINI_API_KEY:
             error_msg = get_translation(language=user_s_data.language, key='error_init_gemini', error="API key not configured")
-            try:
-                bot.send_message(user_id, error_msg)
-            except telebot.apihelper.ApiTelegramException:
-                pass
+            _safe_send(user_id, error_msg)
             return
         gemini_mode_message = get_translation(language=user_s_data.language, key='gemini_mode', model=user_s_data.gemini_model)
-        try:
-            bot.send_message(user_id, gemini_mode_message, reply_markup=get_main_stop_keyboard_func(user_id))
-        except telebot.apihelper.ApiTelegramException as e_send:
-            logging.error(f"Failed to send gemini mode entry message to {user_id}: {e_send}")
+        if not _safe_send(user_id, gemini_mode_message, reply_markup=get_main_stop_keyboard_func(user_id)):
             return
-        user_s_data.state = BotState.GEMINI_MODE
-        if not user_s_data.gemini_chat or not check_session_expiry_func(user_id):
-            model_instance = init_gemini_model(user_s_data.gemini_model)
-            if model_instance:
-                chat_session = start_gemini_chat(model_instance)
-                if chat_session:
-                    user_s_data.gemini_chat = chat_session
-                    user_s_data.session_start_timestamp = datetime.now(timezone.utc)
-                    logging.info(f"Started new Gemini session for {user_id} on entering mode with model {user_s_data.gemini_model}.")
-                else:
-                    error_msg = get_translation(language=user_s_data.language, key='error_start_new_gemini', error="Could not start chat session on mode entry.")
-                    try:
-                        bot.send_message(user_id, error_msg)
-                    except telebot.apihelper.ApiTelegramException:
-                        pass
-                    user_s_data.state = BotState.NONE
-            else:
-                error_msg = get_translation(language=user_s_data.language, key='error_init_gemini', error="Could not initialize model on mode entry.")
-                try:
-                    bot.send_message(user_id, error_msg)
-                except telebot.apihelper.ApiTelegramException:
-                    pass
-                user_s_data.state = BotState.NONE
+        _set_state(user_s_data, BotState.GEMINI_MODE)
+        _ensure_gemini_session(user_id, user_s_data)
     command_handler_map_ref['/gemini'] = start_gemini_mode_command_handler
 
     @bot.message_handler(commands=['new_gemini_chat'])
     @block_checked_decorator
     def new_gemini_chat_command_handler(message: Message) -> None:
-        if hasattr(bot, 'BOT_START_TIME_REFERENCE') and message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()):
+        if _stale(message):
             return
         user_id = message.chat.id
         user_s_data = get_user_data(user_id)
         if not settings.GEMINI_API_KEY:
             error_msg = get_translation(language=user_s_data.language, key='error_start_new_gemini', error="API key not configured")
-            try:
-                bot.send_message(user_id, error_msg)
-            except telebot.apihelper.ApiTelegramException:
-                pass
+            _safe_send(user_id, error_msg)
             return
-        user_s_data.gemini_chat = None
         logging.info(f"User {user_id} started a new Gemini chat via command with model {user_s_data.gemini_model}.")
-        model_instance = init_gemini_model(user_s_data.gemini_model)
-        if model_instance:
-            chat_session = start_gemini_chat(model_instance)
-            if chat_session:
-                user_s_data.gemini_chat = chat_session
-                user_s_data.session_start_timestamp = datetime.now(timezone.utc)
-                new_chat_message = get_translation(language=user_s_data.language, key='new_chat')
-                bot.send_message(user_id, new_chat_message)
-                user_s_data.state = BotState.GEMINI_MODE
-                gemini_mode_message = get_translation(language=user_s_data.language, key='gemini_mode', model=user_s_data.gemini_model)
-                bot.send_message(user_id, gemini_mode_message, reply_markup=get_main_stop_keyboard_func(user_id))
-            else:
-                error_msg = get_translation(language=user_s_data.language, key='error_start_new_gemini', error="Could not start chat session via command.")
-                try:
-                    bot.send_message(user_id, error_msg)
-                except telebot.apihelper.ApiTelegramException:
-                    pass
-                user_s_data.state = BotState.NONE
-        else:
-            error_msg = get_translation(language=user_s_data.language, key='error_init_gemini', error="Could not initialize model for new chat command.")
-            try:
-                bot.send_message(user_id, error_msg)
-            except telebot.apihelper.ApiTelegramException:
-                pass
-            user_s_data.state = BotState.NONE
+        if _ensure_gemini_session(user_id, user_s_data, force_new=True):
+            new_chat_message = get_translation(language=user_s_data.language, key='new_chat')
+            _safe_send(user_id, new_chat_message)
+            _set_state(user_s_data, BotState.GEMINI_MODE)
+            gemini_mode_message = get_translation(language=user_s_data.language, key='gemini_mode', model=user_s_data.gemini_model)
+            _safe_send(user_id, gemini_mode_message, reply_markup=get_main_stop_keyboard_func(user_id))
     command_handler_map_ref['/new_gemini_chat'] = new_gemini_chat_command_handler
 
-    @bot.message_handler(func=lambda message: get_user_data(message.chat.id).state == BotState.GEMINI_MODE)
+    @bot.message_handler(func=_in_gemini_mode)
     @block_checked_decorator
     def handle_gemini_mode_handler(message: Message) -> None:
-        if hasattr(bot, 'BOT_START_TIME_REFERENCE') and message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()):
+        if _stale(message):
             return
         user_id = message.chat.id
         user_s_data = get_user_data(user_id)
         if not settings.GEMINI_API_KEY:
             error_msg = get_translation(language=user_s_data.language, key='error_gemini_processing', error="API key not configured")
-            try:
-                bot.send_message(user_id, error_msg)
-            except telebot.apihelper.ApiTelegramException:
-                pass
-            user_s_data.state = BotState.NONE
+            _safe_send(user_id, error_msg)
+            _set_state(user_s_data, BotState.NONE)
             return
 
         if message.text and message.text.startswith('/'):
             current_state_name = user_s_data.state.name
-            user_s_data.state = BotState.NONE
+            _set_state(user_s_data, BotState.NONE)
             logging.info(f"User {user_id} sent command '{message.text}' while in {current_state_name}. Exiting mode.")
-            command = message.text.split(maxsplit=1)[0].lower()
+            command_match = _CMD_RE.match(message.text)
+            command = f"/{command_match.group(1).lower()}" if command_match else None
             handler_func = command_handler_map_ref.get(command)
             if handler_func:
                 try:
@@ -340,102 +394,105 @@ def register_gemini_handlers(
                 except Exception as e_exec:
                     logging.error(f"Error executing command '{command}' from Gemini mode: {e_exec}", exc_info=True)
                     error_msg = get_translation(language=user_s_data.language, key='error_executing_command', command=command)
-                    try:
-                        bot.send_message(user_id, error_msg)
-                    except telebot.apihelper.ApiTelegramException:
-                        pass
+                    _safe_send(user_id, error_msg)
             else:
                 logging.warning(f"User {user_id} sent unknown command '{command}' in Gemini mode.")
-                try:
-                    bot.send_message(user_id, get_translation(language=user_s_data.language, key='mode_exited'))
-                except telebot.apihelper.ApiTelegramException:
-                    pass
+                _safe_send(user_id, get_translation(language=user_s_data.language, key='mode_exited'))
             return
         elif message.text:
+            if not _try_begin_user_turn(user_id):
+                _safe_send(user_id, get_translation(language=user_s_data.language, key='gemini_still_processing'))
+                return
             if not check_rate_limits(user_id, "gemini"):
+                _end_user_turn(user_id)
+                return
+            if not _ensure_gemini_session(user_id, user_s_data, error_key='error_session_reinit_gemini'):
+                _end_user_turn(user_id)
+                return
+            if not _try_reserve_gemini_slot():
+                _end_user_turn(user_id)
+                _safe_send(user_id, get_translation(language=user_s_data.language, key='gemini_busy'))
                 return
-            if not user_s_data.gemini_chat or not check_session_expiry_func(user_id):
-                model_instance = init_gemini_model(user_s_data.gemini_model)
-                if model_instance:
-                    chat_session = start_gemini_chat(model_instance)
-                    if chat_session:
-                        user_s_data.gemini_chat = chat_session
-                        user_s_data.session_start_timestamp = datetime.now(timezone.utc)
-                        logging.info(f"Re-initialized Gemini session for user {user_id} with model {user_s_data.gemini_model}.")
-                    else:
-                        error_msg = get_translation(language=user_s_data.language, key='error_session_reinit_gemini', error="Could not start chat session.")
-                        try:
-                            bot.send_message(user_id, error_msg)
-                        except telebot.apihelper.ApiTelegramException:
-                            pass
-                        user_s_data.state = BotState.NONE
-                        return
-                else:
-                    error_msg = get_translation(language=user_s_data.language, key='error_session_reinit_gemini', error="Could not initialize model.")
-                    try:
-                        bot.send_message(user_id, error_msg)
-                    except telebot.apihelper.ApiTelegramException:
-                        pass
-                    user_s_data.state = BotState.NONE
-                    return
-            processing_msg = None
             processing_msg_text = get_translation(language=user_s_data.language, key='processing_message')
+            processing_msg = _safe_send(user_id, processing_msg_text, parse_mode="Markdown")
+            cancel_event = threading.Event()
+            future = None
             try:
-                processing_msg = bot.send_message(user_id, processing_msg_text, parse_mode="Markdown")
-            except telebot.apihelper.ApiTelegramException:
-                pass
-            try:
-                full_ai_response = send_message_to_gemini(user_s_data.gemini_chat, message.text)
-                if processing_msg:
-                    try:
-                        bot.delete_message(user_id, processing_msg.message_id)
-                    except telebot.apihelper.ApiTelegramException:
-                        pass
+                future = _gemini_pool.submit(_stream_gemini_reply, user_id, user_s_data.gemini_chat,
+                                             message.text, processing_msg, cancel_event)
+                future.add_done_callback(_release_gemini_slot)
+                future.add_done_callback(lambda _f: _end_user_turn(user_id))
+                full_ai_response = future.result(timeout=settings.GEMINI_TIMEOUT_SECONDS)
                 
                 main_text, code_blocks = extract_code_blocks(full_ai_response)
                 final_reply_markup = get_main_stop_keyboard_func(user_id)
+                cleaned_main_text = clean_markdown_text(main_text) if main_text.strip() else ""
+                
+                edited_in_place = False
+                if processing_msg:
+                    in_place_text, in_place_kwargs = None, {}
+                    if cleaned_main_text:
+                        if len(cleaned_main_text) <= settings.TELEGRAM_MAX_LENGTH:
+                            in_place_text = cleaned_main_text
+                            in_place_kwargs = {'reply_markup': final_reply_markup if not code_blocks else None}
+                    elif len(code_blocks) == 1 and len(code_blocks[0]) <= settings.TELEGRAM_MAX_LENGTH:
+                        in_place_text = code_blocks[0]
+                        in_place_kwargs = {'reply_markup': final_reply_markup, 'parse_mode': "Markdown"}
+                    elif not code_blocks:
+                        in_place_text = "..."
+                        in_place_kwargs = {'reply_markup': final_reply_markup}
+                    if in_place_text is not None:
+                        edited_in_place = _safe_edit(in_place_text, user_id, processing_msg.message_id, **in_place_kwargs)
+                    if not edited_in_place:
+                        _safe_delete(user_id, processing_msg.message_id)
+                    elif cleaned_main_text:
+                        cleaned_main_text = ""
+                    else:
+                        code_blocks = []
                 
-                if main_text.strip():
-                    send_message_splitted(user_id, clean_markdown_text(main_text), 
+                if cleaned_main_text:
+                    send_message_splitted(user_id, cleaned_main_text, 
                                           reply_markup=final_reply_markup if not code_blocks else None)
                 
                 if code_blocks:
-                    send_code_snippets(user_id, user_s_data.language, code_blocks, get_translation,
-                                       reply_markup_for_last=final_reply_markup)
-                elif not main_text.strip() and not code_blocks:
-                   bot.send_message(user_id, "...", reply_markup=final_reply_markup, disable_notification=True)
+                    if not send_code_documents(user_id, user_s_data.language, code_blocks, get_translation,
+                                               reply_markup=final_reply_markup):
+                        send_code_snippets(user_id, user_s_data.language, code_blocks, get_translation,
+                                           reply_markup_for_last=final_reply_markup)
+                elif not edited_in_place and not main_text.strip():
+                   _safe_send(user_id, "...", reply_markup=final_reply_markup, disable_notification=True)
 
+            except FuturesTimeoutError:
+                cancel_event.set()
+                logging.warning(f"Gemini reply for user {user_id} timed out after {settings.GEMINI_TIMEOUT_SECONDS}s.")
+                error_msg = get_translation(language=user_s_data.language, key='error_gemini_processing', error="The AI service took too long to respond.")
+                if not processing_msg or not _safe_edit(error_msg, user_id, processing_msg.message_id):
+                    _safe_send(user_id, error_msg)
+                user_s_data.gemini_chat = None
+                _set_state(user_s_data, BotState.NONE)
             except GeminiBlockedPromptError:
                 error_msg = get_translation(language=user_s_data.language, key='error_gemini_processing', error="Content policy violation or unsafe prompt.")
-                if processing_msg:
-                    try:
-                        bot.edit_message_text(error_msg, user_id, processing_msg.message_id, parse_mode="Markdown")
-                    except telebot.apihelper.ApiTelegramException:
-                        bot.send_message(user_id, error_msg, parse_mode="Markdown")
-                else:
-                    bot.send_message(user_id, error_msg, parse_mode="Markdown")
-                user_s_data.state = BotState.NONE
+                if not processing_msg or not _safe_edit(error_msg, user_id, processing_msg.message_id):
+                    _safe_send(user_id, error_msg)
+                user_s_data.gemini_chat = None
+                _set_state(user_s_data, BotState.NONE)
             except GeminiChatError as e_chat:
-                error_msg = get_translation(language=user_s_data.language, key='error_gemini_processing', error=escape_markdown_v2(str(e_chat)))
-                if processing_msg:
-                    try:
-                        bot.edit_message_text(error_msg, user_id, processing_msg.message_id, parse_mode="Markdown")
-                    except telebot.apihelper.ApiTelegramException:
-                        bot.send_message(user_id, error_msg, parse_mode="Markdown")
-                else:
-                    bot.send_message(user_id, error_msg, parse_mode="Markdown")
-                user_s_data.state = BotState.NONE
+                error_msg = get_translation(language=user_s_data.language, key='error_gemini_processing', error=str(e_chat))
+                if not processing_msg or not _safe_edit(error_msg, user_id, processing_msg.message_id):
+                    _safe_send(user_id, error_msg)
+                user_s_data.gemini_chat = None
+                _set_state(user_s_data, BotState.NONE)
             except Exception as e_general:
                 logging.error(f"Unhandled error in handle_gemini_mode for user {user_id}: {e_general}", exc_info=True)
                 error_msg = get_translation(language=user_s_data.language, key='error_gemini_processing', error="An unexpected error occurred with AI service.")
-                if processing_msg:
-                    try:
-                        bot.edit_message_text(error_msg, user_id, processing_msg.message_id, parse_mode="Markdown")
-                    except telebot.apihelper.ApiTelegramException:
-                        bot.send_message(user_id, error_msg, parse_mode="Markdown")
-                else:
-                    bot.send_message(user_id, error_msg, parse_mode="Markdown")
-                user_s_data.state = BotState.NONE
+                if not processing_msg or not _safe_edit(error_msg, user_id, processing_msg.message_id):
+                    _safe_send(user_id, error_msg)
+                user_s_data.gemini_chat = None
+                _set_state(user_s_data, BotState.NONE)
+            finally:
+                if future is None:
+                    _release_gemini_slot()
+                    _end_user_turn(user_id)
         else:
             logging.debug(f"Received non-text message from user {user_id} in gemini_mode.")
 
@@ -1,10 +1,12 @@
 # handlers/mistral_handlers.py
 import logging
-from datetime import datetime, timezone
-from typing import List, Dict, Callable, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Callable, Optional, Set, Tuple
 
 import telebot
-from telebot.types import Message
+from telebot.types import Message, LinkPreviewOptions
 
 from components.settings_config import settings
 from components.localization import get_translation
@@ -13,17 +15,55 @@ from components.rate_limiter import check_rate_limits, is_user_blocked
 from components.telegram_utils import (
     send_message_splitted,
     clean_markdown_text,
-    escape_markdown_v2,
     extract_code_blocks,
     send_code_snippets
 )
 from components.mistral_service import (
-    send_message_to_mistral,
+    stream_message_to_mistral,
+    create_mistral_session,
     MistralAPIError,
     MistralResponseError,
     MistralError
 )
 
+_STREAM_EDIT_MIN_CHARS = 200
+_STREAM_EDIT_INTERVAL = 1.2
+_MD_FAST_CHARS = frozenset('`*_~[#')
+_NO_LINK_PREVIEW = LinkPreviewOptions(is_disabled=True)
+# Нетекстовые сообщения в режиме Mistral поглощаются здесь, а не уходят в общий обработчик
+_MISTRAL_CONTENT_TYPES = ['text', 'audio', 'photo', 'voice', 'video', 'document', 'location', 'contact', 'sticker']
+
+_mistral_pool = ThreadPoolExecutor(max_workers=settings.MISTRAL_WORKERS, thread_name_prefix='mistral')
+_mistral_pending: Dict[int, List[Tuple[int, str, Optional[Message]]]] = {}
+_mistral_pending_lock = threading.Lock()
+_MISTRAL_MODE_USERS: Set[int] = set()
+
+
+def _set_state(user_data, state: BotState) -> None:
+    user_data.state = state
+    if state == BotState.MISTRAL_MODE:
+        _MISTRAL_MODE_USERS.add(user_data.user_id)
+    else:
+        _MISTRAL_MODE_USERS.discard(user_data.user_id)
+
+
+def _trim_history(chat_history: List[Dict[str, str]], max_turns: int) -> None:
+    # Оставляем системный промпт (если есть), последние max_turns - 1 пар и текущий вопрос
+    head = 1 if chat_history and chat_history[0]["role"] == "system" else 0
+    excess = len(chat_history) - head - (max_turns * 2 - 1)
+    if excess > 0:
+        del chat_history[head:head + excess]
+
+
+def _in_mistral_mode(message: Message) -> bool:
+    chat_id = message.chat.id
+    if chat_id not in _MISTRAL_MODE_USERS:
+        return False
+    if get_user_data(chat_id).state == BotState.MISTRAL_MODE:
+        return True
+    _MISTRAL_MODE_USERS.discard(chat_id)
+    return False
+
 
 def register_mistral_handlers(
     bot: telebot.TeleBot,
@@ -39,11 +79,14 @@ def register_mistral_handlers(
             logging.warning("MISTRAL_API_KEY is not set. Mistral handlers will not be registered even if feature is enabled.")
         return
 
+    requests_session = create_mistral_session()
+    _bot_start_ts = bot.BOT_START_TS
+
     def _is_old_message(message: Message) -> bool:
-        return (hasattr(bot, 'BOT_START_TIME_REFERENCE') and 
-                message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()))
+        return message.date < _bot_start_ts
 
     def _send_safe_message(user_id: int, text: str, **kwargs) -> Optional[Message]:
+        kwargs.setdefault('link_preview_options', _NO_LINK_PREVIEW)
         try:
             return bot.send_message(user_id, text, **kwargs)
         except telebot.apihelper.ApiTelegramException as e:
@@ -52,7 +95,7 @@ def register_mistral_handlers(
 
     def _init_mistral_session(user_data) -> None:
         user_data.mistral_chat_history = []
-        user_data.session_start_timestamp = datetime.now(timezone.utc)
+        user_data.start_session()
 
     @bot.message_handler(commands=['mistral'])
     @block_checked_decorator
@@ -68,7 +111,7 @@ def register_mistral_handlers(
                                  reply_markup=get_main_stop_keyboard_func(user_id)):
             return
             
-        user_data.state = BotState.MISTRAL_MODE
+        _set_state(user_data, BotState.MISTRAL_MODE)
         if not user_data.mistral_chat_history or not bot.check_session_expiry_reference(user_id):
             _init_mistral_session(user_data)
             logging.info(f"Initialized Mistral chat history for user {user_id}.")
@@ -88,17 +131,17 @@ def register_mistral_handlers(
         new_chat_message = get_translation(user_data.language, 'new_mistral_chat')
         _send_safe_message(user_id, new_chat_message)
         
-        user_data.state = BotState.MISTRAL_MODE
+        _set_state(user_data, BotState.MISTRAL_MODE)
         mistral_mode_message = get_translation(user_data.language, 'mistral_mode')
         
         if not _send_safe_message(user_id, mistral_mode_message, 
                                  reply_markup=get_main_stop_keyboard_func(user_id)):
             logging.error(f"Failed to send mistral mode message after /new_mistral_chat")
-            user_data.state = BotState.NONE
+            _set_state(user_data, BotState.NONE)
 
     def _handle_command_in_mistral_mode(message: Message, user_data, user_id: int) -> None:
         current_state_name = user_data.state.name
-        user_data.state = BotState.NONE
+        _set_state(user_data, BotState.NONE)
         logging.info(f"User {user_id} sent command '{message.text}' while in {current_state_name}. Exiting mode.")
         
         command = message.text.split(maxsplit=1)[0].lower()
@@ -117,7 +160,10 @@ def register_mistral_handlers(
             logging.warning(f"User {user_id} sent unknown command '{command}' in Mistral mode.")
             _send_safe_message(user_id, get_translation(user_data.language, 'mode_exited'))
 
-    def _handle_mistral_error(error, user_data, user_id: int, processing_msg_obj: Optional[Message]) -> None:
+    def _handle_mistral_error(error, user_data, user_id: int, processing_msg_obj: Optional[Message],
+                              chat_history: List[Dict[str, str]]) -> None:
+        # Пока шёл запрос, пользователь мог начать новый чат - чужую историю не трогаем
+        history_is_current = user_data.mistral_chat_history is chat_history
         if isinstance(error, MistralAPIError):
             if error.status_code == 429:
                 user_error_message = get_translation(user_data.language, 'mistral_busy')
@@ -130,33 +176,36 @@ def register_mistral_handlers(
                     user_data.language, 'error_mistral_processing', error=specific_error_text
                 )
             
-            if user_data.mistral_chat_history and user_data.mistral_chat_history[-1]["role"] == "user":
-                user_data.mistral_chat_history.pop()
+            if history_is_current and chat_history and chat_history[-1]["role"] == "user":
+                chat_history.pop()
         else:
             if isinstance(error, MistralResponseError):
                 error_detail_text = get_translation(user_data.language, 'mistral_invalid_response')
             else:
                 error_detail_text = get_translation(
                     user_data.language, "error_mistral_processing", 
-                    error=escape_markdown_v2(str(error))
+                    error=str(error)
                 )
             
             user_error_message = get_translation(
                 user_data.language, 'error_mistral_processing', error=error_detail_text
             )
-            user_data.mistral_chat_history = []
+            if history_is_current:
+                user_data.mistral_chat_history = []
         
         if processing_msg_obj:
             try:
-                bot.edit_message_text(user_error_message, user_id, processing_msg_obj.message_id, parse_mode="Markdown")
-            except:
-                _send_safe_message(user_id, user_error_message, parse_mode="Markdown")
+                bot.edit_message_text(user_error_message, user_id, processing_msg_obj.message_id)
+            except telebot.apihelper.ApiTelegramException:
+                _send_safe_message(user_id, user_error_message)
         else:
-            _send_safe_message(user_id, user_error_message, parse_mode="Markdown")
+            _send_safe_message(user_id, user_error_message)
         
-        user_data.state = BotState.NONE
+        # Ответ приходит асинхронно - если пользователь уже в другом режиме, состояние не сбрасываем
+        if user_data.state == BotState.MISTRAL_MODE:
+            _set_state(user_data, BotState.NONE)
 
-    @bot.message_handler(func=lambda message: get_user_data(message.chat.id).state == BotState.MISTRAL_MODE)
+    @bot.message_handler(content_types=_MISTRAL_CONTENT_TYPES, func=_in_mistral_mode)
     @block_checked_decorator
     def handle_mistral_mode_message_handler(message: Message) -> None:
         if _is_old_message(message):
@@ -169,7 +218,7 @@ def register_mistral_handlers(
             error_msg = get_translation(user_data.language, 'error_mistral_processing', 
                                       error="API key not configured")
             _send_safe_message(user_id, error_msg)
-            user_data.state = BotState.NONE
+            _set_state(user_data, BotState.NONE)
             return
 
         if message.text and message.text.startswith('/'):
@@ -179,7 +228,7 @@ def register_mistral_handlers(
         if not message.text:
             logging.debug(f"Received non-text message from user {user_id} in mistral_mode.")
             return
-            
+        
         if not check_rate_limits(user_id, "mistral"):
             return
             
@@ -189,33 +238,101 @@ def register_mistral_handlers(
 
         processing_msg_text = get_translation(user_data.language, 'processing_message')
         processing_msg_obj = _send_safe_message(user_id, processing_msg_text, parse_mode="Markdown")
-        
+        with _mistral_pending_lock:
+            pending = _mistral_pending.get(user_id)
+            if pending is not None:
+                # Воркер для этого пользователя уже запущен - он заберёт сообщение следующей пачкой
+                pending.append((message.message_id, message.text, processing_msg_obj))
+                return
+            _mistral_pending[user_id] = [(message.message_id, message.text, processing_msg_obj)]
         try:
-            chat_history = user_data.mistral_chat_history
-            chat_history.append({"role": "user", "content": message.text})
+            _mistral_pool.submit(_drain_mistral_queue, user_id, user_data)
+        except RuntimeError as e:
+            logging.error(f"Could not schedule Mistral request for user {user_id}: {e}")
+            with _mistral_pending_lock:
+                _mistral_pending.pop(user_id, None)
+
+    def _drain_mistral_queue(user_id: int, user_data) -> None:
+        # Один воркер на пользователя: сообщения, пришедшие во время запроса, объединяются в один ход
+        while True:
+            with _mistral_pending_lock:
+                batch = _mistral_pending[user_id]
+                if not batch:
+                    del _mistral_pending[user_id]
+                    return
+                _mistral_pending[user_id] = []
+            # Обновления одного чата могут прийти в обработчик не по порядку из разных потоков telebot
+            batch.sort(key=lambda item: item[0])
+            # Если предыдущий ход завершился ошибкой и режим закрыт, оставшиеся сообщения не отправляем
+            in_mode = user_data.state == BotState.MISTRAL_MODE
+            for _, _, stale_msg in (batch[:-1] if in_mode else batch):
+                if stale_msg:
+                    try:
+                        bot.delete_message(user_id, stale_msg.message_id)
+                    except telebot.apihelper.ApiTelegramException:
+                        pass
+            if not in_mode:
+                logging.info(f"Discarding {len(batch)} pending Mistral message(s) for user {user_id}: mode has ended.")
+                continue
+            prompt_text = "\n\n".join(text for _, text, _ in batch)
+            try:
+                _do_mistral_roundtrip(user_id, user_data, prompt_text, batch[-1][2])
+            except Exception as e:
+                logging.error(f"Mistral worker failed for user {user_id}: {e}", exc_info=True)
+
+    def _stream_mistral_reply(user_id: int, chat_history: List[Dict[str, str]],
+                              processing_msg_obj: Optional[Message]) -> str:
+        parts: List[str] = []
+        length = 0
+        shown_length = 0
+        last_edit = time.monotonic()
+        for chunk_text in stream_message_to_mistral(
+            api_key=settings.MISTRAL_API_KEY,
+            chat_history=chat_history,
+            requests_session=requests_session
+        ):
+            parts.append(chunk_text)
+            length += len(chunk_text)
+            if (processing_msg_obj and length - shown_length >= _STREAM_EDIT_MIN_CHARS
+                    and length <= settings.TELEGRAM_MAX_LENGTH
+                    and time.monotonic() - last_edit >= _STREAM_EDIT_INTERVAL):
+                try:
+                    bot.edit_message_text(clean_markdown_text("".join(parts)), user_id, processing_msg_obj.message_id)
+                except telebot.apihelper.ApiTelegramException as e:
+                    logging.debug(f"Skipping interim Mistral edit for {user_id}: {e}")
+                shown_length = length
+                last_edit = time.monotonic()
+        return "".join(parts)
+
+    def _do_mistral_roundtrip(user_id: int, user_data, prompt_text: str, processing_msg_obj: Optional[Message]) -> None:
+        chat_history = user_data.mistral_chat_history
+        try:
+            chat_history.append({"role": "user", "content": prompt_text})
+            _trim_history(chat_history, settings.MISTRAL_MAX_HISTORY_TURNS)
             
-            requests_session = telebot.apihelper._get_req_session()
-            full_ai_response = send_message_to_mistral(
-                api_key=settings.MISTRAL_API_KEY, 
-                chat_history=chat_history, 
-                requests_session=requests_session
-            )
+            full_ai_response = _stream_mistral_reply(user_id, chat_history, processing_msg_obj)
             
             chat_history.append({"role": "assistant", "content": full_ai_response})
 
             if processing_msg_obj:
                 try:
                     bot.delete_message(user_id, processing_msg_obj.message_id)
-                except:
+                except telebot.apihelper.ApiTelegramException:
                     pass
             
-            main_text, code_blocks = extract_code_blocks(full_ai_response)
+            if _MD_FAST_CHARS.isdisjoint(full_ai_response):
+                main_text, code_blocks = full_ai_response.strip(), []
+                cleaned_main_text = main_text
+            else:
+                main_text, code_blocks = extract_code_blocks(full_ai_response)
+                cleaned_main_text = clean_markdown_text(main_text)
             final_reply_markup = get_main_stop_keyboard_func(user_id)
             
             if main_text.strip():
                 send_message_splitted(
-                    user_id, clean_markdown_text(main_text), 
-                    reply_markup=final_reply_markup if not code_blocks else None
+                    user_id, cleaned_main_text, 
+                    reply_markup=final_reply_markup if not code_blocks else None,
+                    link_preview_options=_NO_LINK_PREVIEW
                 )
             
             if code_blocks:
@@ -227,22 +344,24 @@ def register_mistral_handlers(
                 _send_safe_message(user_id, "...", reply_markup=final_reply_markup, disable_notification=True)
 
         except (MistralAPIError, MistralResponseError, MistralError) as e:
-            _handle_mistral_error(e, user_data, user_id, processing_msg_obj)
+            _handle_mistral_error(e, user_data, user_id, processing_msg_obj, chat_history)
         except Exception as e:
-            logging.error(f"General unhandled error in handle_mistral_mode_message for user {user_id}: {e}", exc_info=True)
+            logging.error(f"General unhandled error in Mistral round-trip for user {user_id}: {e}", exc_info=True)
             user_error_message = get_translation(user_data.language, "error_mistral_processing", 
                                                error="An unexpected error occurred.")
-            user_data.mistral_chat_history = []
+            if user_data.mistral_chat_history is chat_history:
+                user_data.mistral_chat_history = []
             
             if processing_msg_obj:
                 try:
-                    bot.edit_message_text(user_error_message, user_id, processing_msg_obj.message_id, parse_mode="Markdown")
-                except:
-                    _send_safe_message(user_id, user_error_message, parse_mode="Markdown")
+                    bot.edit_message_text(user_error_message, user_id, processing_msg_obj.message_id)
+                except telebot.apihelper.ApiTelegramException:
+                    _send_safe_message(user_id, user_error_message)
             else:
-                _send_safe_message(user_id, user_error_message, parse_mode="Markdown")
+                _send_safe_message(user_id, user_error_message)
             
-            user_data.state = BotState.NONE
+            if user_data.state == BotState.MISTRAL_MODE:
+                _set_state(user_data, BotState.NONE)
 
     command_handler_map_ref['/mistral'] = start_mistral_mode_command_handler
     command_handler_map_ref['/new_mistral_chat'] = new_mistral_chat_command_handler
@@ -2,7 +2,8 @@
 import logging
 import telebot
 from telebot.types import Message
-from typing import Dict, Callable
+from telebot.util import extract_command
+from typing import Dict, Callable, NamedTuple, Optional
 from datetime import datetime, timezone, timedelta
 
 from components.settings_config import settings
@@ -19,6 +20,13 @@ from components.user_data_manager import (
     BotState
 )
 
+
+class _OwnerCmd(NamedTuple):
+    action: Callable[[Message, str, int, int], None]
+    parse_error_key: str
+    parse_error_default: Optional[str]
+
+
 def register_owner_handlers(
     bot: telebot.TeleBot,
     owner_only_decorator: Callable,
@@ -28,34 +36,19 @@ def register_owner_handlers(
         logging.info("Owner features are disabled by settings.")
         return
 
-    @bot.message_handler(commands=['addtrusted'])
-    @owner_only_decorator
-    def add_trusted_command_handler(message: Message):
-        if hasattr(bot, 'BOT_START_TIME_REFERENCE') and message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()):
-            return
-        user_id_of_caller = message.from_user.id
-        caller_s_data = get_user_data(user_id_of_caller)
-
-        parts = message.text.split()
-        if len(parts) < 2:
-            bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_addtrusted_parse_error'))
-            return
-        try:
-            target_user_id = int(parts[1])
-        except ValueError:
-            bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_addtrusted_parse_error'))
-            return
+    _bot_start_ts = bot.BOT_START_TS
 
+    def _add_trusted(message: Message, lang: str, caller_id: int, target_user_id: int) -> None:
         try:
             if target_user_id in settings.TRUSTED_USERS_SET:
-                bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_addtrusted_already', target_user_id=target_user_id))
+                bot.reply_to(message, get_translation(language=lang, key='owner_cmd_addtrusted_already', target_user_id=target_user_id))
             else:
                 add_trusted_user_db(target_user_id)
-                settings._trusted_users_set_cache = None
+                settings.add_trusted_user_to_cache(target_user_id)
                 if target_user_id in settings.TRUSTED_USERS_SET:
                     check_and_unblock_if_trusted(target_user_id, settings.TRUSTED_USERS_SET)
-                    logging.info(f"Owner {user_id_of_caller} added user {target_user_id} to trusted list (DB and runtime).")
-                    bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_addtrusted_success', target_user_id=target_user_id))
+                    logging.info(f"Owner {caller_id} added user {target_user_id} to trusted list (DB and runtime).")
+                    bot.reply_to(message, get_translation(language=lang, key='owner_cmd_addtrusted_success', target_user_id=target_user_id))
                 else:
                     logging.error(f"Failed to verify user {target_user_id} in TRUSTED_USERS_SET after DB add.")
                     bot.reply_to(message, "Error verifying trusted status after update.")
@@ -63,75 +56,40 @@ def register_owner_handlers(
             logging.error(f"API error sending reply in add_trusted_command: {e_reply}")
         except Exception as e:
             logging.error(f"Unexpected error in add_trusted_command: {e}", exc_info=True)
-    command_handler_map_ref['/addtrusted'] = add_trusted_command_handler
-
-    @bot.message_handler(commands=['removetrusted'])
-    @owner_only_decorator
-    def remove_trusted_command_handler(message: Message):
-        if hasattr(bot, 'BOT_START_TIME_REFERENCE') and message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()):
-            return
-        user_id_of_caller = message.from_user.id
-        caller_s_data = get_user_data(user_id_of_caller)
-
-        parts = message.text.split()
-        if len(parts) < 2:
-            bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_removetrusted_parse_error'))
-            return
-        try:
-            target_user_id = int(parts[1])
-        except ValueError:
-            bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_removetrusted_parse_error'))
-            return
 
+    def _remove_trusted(message: Message, lang: str, caller_id: int, target_user_id: int) -> None:
         try:
             if target_user_id == settings.BOT_OWNER_USER_ID:
-                bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_removetrusted_is_owner', target_user_id=target_user_id))
+                bot.reply_to(message, get_translation(language=lang, key='owner_cmd_removetrusted_is_owner', target_user_id=target_user_id))
                 return
             if target_user_id in settings.TRUSTED_USERS_SET:
                 remove_trusted_user_db(target_user_id)
-                settings._trusted_users_set_cache = None
+                settings.discard_trusted_user_from_cache(target_user_id)
                 if target_user_id not in settings.TRUSTED_USERS_SET:
-                    logging.info(f"Owner {user_id_of_caller} removed user {target_user_id} from trusted list (DB and runtime).")
-                    bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_removetrusted_success', target_user_id=target_user_id))
+                    logging.info(f"Owner {caller_id} removed user {target_user_id} from trusted list (DB and runtime).")
+                    bot.reply_to(message, get_translation(language=lang, key='owner_cmd_removetrusted_success', target_user_id=target_user_id))
                 else:
                     logging.error(f"Failed to verify user {target_user_id} removal from TRUSTED_USERS_SET after DB remove.")
                     bot.reply_to(message, "Error verifying trusted status after update.")
             else:
-                bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_removetrusted_not_found', target_user_id=target_user_id))
+                bot.reply_to(message, get_translation(language=lang, key='owner_cmd_removetrusted_not_found', target_user_id=target_user_id))
         except telebot.apihelper.ApiTelegramException as e_reply:
             logging.error(f"API error sending reply in remove_trusted_command: {e_reply}")
         except Exception as e:
             logging.error(f"Unexpected error in remove_trusted_command: {e}", exc_info=True)
-    command_handler_map_ref['/removetrusted'] = remove_trusted_command_handler
-
-    @bot.message_handler(commands=['ban'])
-    @owner_only_decorator
-    def ban_user_command_handler(message: Message):
-        if hasattr(bot, 'BOT_START_TIME_REFERENCE') and message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()): return
-        caller_id = message.from_user.id
-        caller_s_data = get_user_data(caller_id)
-
-        parts = message.text.split()
-        if len(parts) < 2:
-            bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_ban_parse_error', default="Usage: /ban <user_id>"))
-            return
-        try:
-            target_user_id = int(parts[1])
-        except ValueError:
-            bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_ban_parse_error', default="Usage: /ban <user_id>"))
-            return
 
+    def _ban(message: Message, lang: str, caller_id: int, target_user_id: int) -> None:
         try:
             if target_user_id == settings.BOT_OWNER_USER_ID:
-                bot.reply_to(message, get_translation(language=caller_s_data.language, key='cannot_ban_owner', default="Cannot ban the bot owner."))
+                bot.reply_to(message, get_translation(language=lang, key='cannot_ban_owner', default="Cannot ban the bot owner."))
                 return
             if target_user_id == caller_id:
-                bot.reply_to(message, get_translation(language=caller_s_data.language, key='cannot_ban_self', default="You cannot ban yourself."))
+                bot.reply_to(message, get_translation(language=lang, key='cannot_ban_self', default="You cannot ban yourself."))
                 return
 
             existing_block_info = get_blocked_user_info_db(target_user_id)
             if existing_block_info and existing_block_info[1] == -1 and existing_block_info[0] > datetime.now(timezone.utc):
-                already_banned_msg = get_translation(language=caller_s_data.language, key='owner_cmd_user_already_banned', default="User {target_user_id} is already manually banned.", target_user_id=target_user_id)
+                already_banned_msg = get_translation(language=lang, key='owner_cmd_user_already_banned', default="User {target_user_id} is already manually banned.", target_user_id=target_user_id)
                 bot.reply_to(message, already_banned_msg)
                 return
             
@@ -145,52 +103,67 @@ def register_owner_handlers(
             target_user_s_data.reset_chat_histories()
             
             logging.info(f"Owner {caller_id} manually banned user {target_user_id} permanently.")
-            banned_success_msg = get_translation(language=caller_s_data.language, key='owner_cmd_ban_success', default="User {target_user_id} has been banned.", target_user_id=target_user_id)
+            banned_success_msg = get_translation(language=lang, key='owner_cmd_ban_success', default="User {target_user_id} has been banned.", target_user_id=target_user_id)
             bot.reply_to(message, banned_success_msg)
         except Exception as e:
             logging.error(f"Error in ban_user_command: {e}", exc_info=True)
-            error_msg = get_translation(language=caller_s_data.language, key='owner_cmd_ban_error', default="An error occurred while trying to ban the user.")
+            error_msg = get_translation(language=lang, key='owner_cmd_ban_error', default="An error occurred while trying to ban the user.")
             bot.reply_to(message, error_msg)
-    command_handler_map_ref['/ban'] = ban_user_command_handler
-
-    @bot.message_handler(commands=['unban'])
-    @owner_only_decorator
-    def unban_user_command_handler(message: Message):
-        if hasattr(bot, 'BOT_START_TIME_REFERENCE') and message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp()): return
-        caller_id = message.from_user.id
-        caller_s_data = get_user_data(caller_id)
-
-        parts = message.text.split()
-        if len(parts) < 2:
-            bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_unban_parse_error', default="Usage: /unban <user_id>"))
-            return
-        try:
-            target_user_id = int(parts[1])
-        except ValueError:
-            bot.reply_to(message, get_translation(language=caller_s_data.language, key='owner_cmd_unban_parse_error', default="Usage: /unban <user_id>"))
-            return
 
+    def _unban(message: Message, lang: str, caller_id: int, target_user_id: int) -> None:
         try:
             existing_block_info = get_blocked_user_info_db(target_user_id)
             if not existing_block_info or existing_block_info[0] < datetime.now(timezone.utc):
-                not_banned_msg = get_translation(language=caller_s_data.language, key='owner_cmd_user_not_banned', default="User {target_user_id} is not currently effectively banned.", target_user_id=target_user_id)
+                not_banned_msg = get_translation(language=lang, key='owner_cmd_user_not_banned', default="User {target_user_id} is not currently effectively banned.", target_user_id=target_user_id)
                 bot.reply_to(message, not_banned_msg)
                 unblock_user_db(target_user_id)
-                if target_user_id in user_data_store:
-                    user_data_store[target_user_id].unblock()
+                cached_user_data = user_data_store.get(target_user_id)
+                if cached_user_data is not None:
+                    cached_user_data.unblock()
                 return
 
             target_user_s_data = get_user_data(target_user_id)
             target_user_s_data.unblock()
             
             logging.info(f"Owner {caller_id} unbanned user {target_user_id}.")
-            unbanned_success_msg = get_translation(language=caller_s_data.language, key='owner_cmd_unban_success', default="User {target_user_id} has been unbanned.", target_user_id=target_user_id)
+            unbanned_success_msg = get_translation(language=lang, key='owner_cmd_unban_success', default="User {target_user_id} has been unbanned.", target_user_id=target_user_id)
             bot.reply_to(message, unbanned_success_msg)
         except Exception as e:
             logging.error(f"Error in unban_user_command: {e}", exc_info=True)
-            error_msg = get_translation(language=caller_s_data.language, key='owner_cmd_unban_error', default="An error occurred while trying to unban the user.")
+            error_msg = get_translation(language=lang, key='owner_cmd_unban_error', default="An error occurred while trying to unban the user.")
             bot.reply_to(message, error_msg)
-    command_handler_map_ref['/unban'] = unban_user_command_handler
+
+    owner_commands: Dict[str, _OwnerCmd] = {
+        'addtrusted': _OwnerCmd(_add_trusted, 'owner_cmd_addtrusted_parse_error', None),
+        'removetrusted': _OwnerCmd(_remove_trusted, 'owner_cmd_removetrusted_parse_error', None),
+        'ban': _OwnerCmd(_ban, 'owner_cmd_ban_parse_error', "Usage: /ban <user_id>"),
+        'unban': _OwnerCmd(_unban, 'owner_cmd_unban_parse_error', "Usage: /unban <user_id>"),
+    }
+
+    @bot.message_handler(commands=list(owner_commands))
+    @owner_only_decorator
+    def owner_command_handler(message: Message):
+        if message.date < _bot_start_ts:
+            return
+        spec = owner_commands.get((extract_command(message.text) or "").lower())
+        if spec is None:
+            return
+        caller_id = message.from_user.id
+        lang = get_user_data(caller_id).language
+
+        parts = message.text.split(maxsplit=2)
+        try:
+            target_user_id = int(parts[1]) if len(parts) >= 2 else None
+        except ValueError:
+            target_user_id = None
+        if target_user_id is None:
+            bot.reply_to(message, get_translation(language=lang, key=spec.parse_error_key, default=spec.parse_error_default))
+            return
+
+        spec.action(message, lang, caller_id, target_user_id)
+
+    for command_name in owner_commands:
+        command_handler_map_ref[f'/{command_name}'] = owner_command_handler
 
     if settings.ENABLE_OWNER_FEATURES:
         logging.info("Owner handlers registered.")
@@ -1,18 +1,79 @@
 # handlers/payment_handlers.py
 import logging
-import uuid
-from datetime import datetime, timezone
-from typing import List, Callable, Dict, Optional
+import queue
+import re
+import secrets
+import threading
+import time
+from functools import wraps
+from typing import List, Callable, Dict, Optional, Tuple
 
 import telebot
-from telebot import types
-from telebot.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, LabeledPrice, PreCheckoutQuery, SuccessfulPayment
+from telebot.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, LabeledPrice, PreCheckoutQuery
 
 from components.settings_config import settings
-from components.localization import get_translation
+from components.localization import get_translation, LANGUAGES
 from components.user_data_manager import get_user_data, BotState, add_trusted_user_db, check_and_unblock_if_trusted
+from components.rate_limiter import is_user_blocked
 from components.telegram_utils import clean_markdown_text, escape_markdown_v2
 
+_DONATE_AMOUNT_PREFIX = "donate_amount:"
+_DONATE_AMOUNT_PREFIX_LEN = len(_DONATE_AMOUNT_PREFIX)
+_DONATION_CALLBACK_PREFIXES = (_DONATE_AMOUNT_PREFIX, "donate_custom", "cancel_donation")
+_DONATE_PAYLOAD_PREFIX = "donate_"
+_STARS_CURRENCY = "XTR"
+_INVOICE_LABEL = "Support AI Helper"
+_OWNER_NOTIFY_BATCH_SIZE = 10
+_OWNER_NOTIFY_WINDOW_SECONDS = 1.0
+_OWNER_NOTIFY_SEPARATOR = "\n\n---\n\n"
+_MARKDOWN_SAFE_TOKEN_REGEX = re.compile(r'[A-Za-z0-9_]*')
+
+_DONATION_NOTIFICATION_TEMPLATE = (
+    "💎 Received donation of {amount}⭐️ from user:\n"
+    "ID: `{user_id}`\nUsername: {username_md}\n"
+    "Payload: `{payload}`\n"
+    "Charge ID: `{charge_id}`"
+)
+_UNEXPECTED_PAYMENT_NOTIFICATION_TEMPLATE = (
+    "⚠️ Received unexpected successful payment:\n"
+    "User ID: `{user_id}` ({username_md})\n"
+    "Amount: {amount} XTR\n"
+    "Payload: `{payload}`\n"
+    "Charge ID: `{charge_id}`"
+)
+
+
+def _skip_if_stale(start_ts: int) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(message: Message, *args, **kwargs):
+            if message.date < start_ts:
+                return
+            return func(message, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _is_custom_amount_input(message: Message) -> bool:
+    message._user_data = get_user_data(message.chat.id)
+    return message._user_data.state == BotState.DONATE_CUSTOM_AMOUNT_INPUT
+
+
+def _build_donate_info_message(text: str) -> Tuple[str, Optional[str]]:
+    # Жирные фрагменты *...* сохраняем, остальное экранируем под MarkdownV2
+    parts = text.split('*')
+    if len(parts) % 2 == 0:
+        return clean_markdown_text(text), None
+    return '*'.join(escape_markdown_v2(part).replace('_', r'\_') for part in parts), "MarkdownV2"
+
+
+def _escape_if_needed(text: Optional[str]) -> str:
+    # Идентификаторы Telegram обычно состоят только из букв, цифр и "_" - экранировать нечего
+    text_str = str(text)
+    if _MARKDOWN_SAFE_TOKEN_REGEX.fullmatch(text_str):
+        return text_str
+    return escape_markdown_v2(text_str)
+
 
 def register_payment_handlers(
     bot: telebot.TeleBot,
@@ -24,6 +85,9 @@ def register_payment_handlers(
         logging.info("Payments feature is disabled by settings. Skipping Payment handlers registration.")
         return
 
+    allowed_commands_when_blocked = frozenset(allowed_commands_when_blocked_list)
+    skip_if_stale = _skip_if_stale(bot.BOT_START_TS)
+
     def _safe_bot_action(action_func, *args, **kwargs) -> bool:
         try:
             action_func(*args, **kwargs)
@@ -35,26 +99,94 @@ def register_payment_handlers(
         error_msg = get_translation(language=language, key=error_key)
         _safe_bot_action(bot.send_message, user_id, error_msg)
 
-    def _create_donation_keyboard(language: str) -> InlineKeyboardMarkup:
+    preset_amount_buttons = tuple(
+        InlineKeyboardButton(f"{amount} ⭐️", callback_data=f"{_DONATE_AMOUNT_PREFIX}{amount}")
+        for amount in settings.DONATION_PRESET_AMOUNTS
+    )
+    donation_keyboards: Dict[str, InlineKeyboardMarkup] = {}
+    for language_code in LANGUAGES:
         keyboard = InlineKeyboardMarkup(row_width=3)
-        buttons = [
-            InlineKeyboardButton(f"{amount} ⭐️", callback_data=f"donate_amount:{amount}")
-            for amount in settings.DONATION_PRESET_AMOUNTS
-        ]
-        keyboard.add(*buttons)
-        
-        custom_amount_text = get_translation(language=language, key='custom_amount_button')
+        keyboard.add(*preset_amount_buttons)
+        custom_amount_text = get_translation(language=language_code, key='custom_amount_button')
         keyboard.add(InlineKeyboardButton(custom_amount_text, callback_data="donate_custom"))
-        return keyboard
+        donation_keyboards[language_code] = keyboard
 
-    def _send_donation_invoice(user_id: int, amount: int) -> None:
-        user_data = get_user_data(user_id)
-        
+    def _get_donation_keyboard(language: str) -> InlineKeyboardMarkup:
+        return donation_keyboards.get(language) or donation_keyboards[settings.DEFAULT_LANGUAGE]
+
+    donate_info_messages: Dict[str, Tuple[str, Optional[str]]] = {
+        language_code: _build_donate_info_message(get_translation(language=language_code, key='donate_info'))
+        for language_code in LANGUAGES
+    }
+
+    owner_notification_queue: queue.Queue = queue.Queue()
+
+    def _send_owner_message(owner_id: int, text: str) -> None:
+        parse_mode = "Markdown"
+        waited_retry_after = False
+        for _ in range(3):
+            try:
+                bot.send_message(owner_id, text, parse_mode=parse_mode)
+                return
+            except telebot.apihelper.ApiTelegramException as e:
+                retry_after = None
+                if e.error_code == 429 and isinstance(e.result_json, dict):
+                    retry_after = e.result_json.get('parameters', {}).get('retry_after')
+                if retry_after and not waited_retry_after:
+                    waited_retry_after = True
+                    time.sleep(retry_after)
+                    continue
+                # Одно неразбираемое уведомление не должно терять всю пачку - шлем ее без разметки
+                if e.error_code == 400 and parse_mode and "parse" in (e.description or "").lower():
+                    logging.warning(f"Owner notification Markdown rejected, resending as plain text: {e}")
+                    parse_mode = None
+                    continue
+                logging.error(f"Failed to deliver owner notification: {e}")
+                return
+            except Exception as e:
+                logging.error(f"Unexpected error delivering owner notification: {e}", exc_info=True)
+                return
+
+    def _owner_notification_worker() -> None:
+        # Уведомления владельцу, пришедшие в пределах окна, склеиваются в одно сообщение
+        while True:
+            batch = [owner_notification_queue.get()]
+            deadline = time.monotonic() + _OWNER_NOTIFY_WINDOW_SECONDS
+            while len(batch) < _OWNER_NOTIFY_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(owner_notification_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            owner_id = settings.BOT_OWNER_USER_ID
+            if not owner_id:
+                continue
+            current = batch[0]
+            for notification in batch[1:]:
+                combined = f"{current}{_OWNER_NOTIFY_SEPARATOR}{notification}"
+                if len(combined) > settings.TELEGRAM_MAX_LENGTH:
+                    _send_owner_message(owner_id, current)
+                    current = notification
+                else:
+                    current = combined
+            _send_owner_message(owner_id, current)
+
+    threading.Thread(target=_owner_notification_worker, name='owner-notify', daemon=True).start()
+
+    preset_invoice_prices: Dict[int, List[LabeledPrice]] = {
+        amount: [LabeledPrice(label=_INVOICE_LABEL, amount=amount)]
+        for amount in settings.DONATION_PRESET_AMOUNTS
+    }
+
+    def _send_donation_invoice(user_id: int, amount: int, lang: str) -> None:
         try:
-            title = get_translation(language=user_data.language, key='donate_invoice_title')
-            description = get_translation(language=user_data.language, key='donate_invoice_description')
-            payload_id = f"donate_{uuid.uuid4()}"
-            price = LabeledPrice(label="Support AI Helper", amount=amount)
+            title = get_translation(language=lang, key='donate_invoice_title')
+            description = get_translation(language=lang, key='donate_invoice_description')
+            payload_id = f"{_DONATE_PAYLOAD_PREFIX}{secrets.token_hex(8)}"
+            prices = preset_invoice_prices.get(amount) or [LabeledPrice(label=_INVOICE_LABEL, amount=amount)]
             
             bot.send_invoice(
                 chat_id=user_id,
@@ -62,8 +194,8 @@ def register_payment_handlers(
                 description=description,
                 invoice_payload=payload_id,
                 provider_token="",
-                currency="XTR",
-                prices=[price]
+                currency=_STARS_CURRENCY,
+                prices=prices
             )
             
             logging.info(f"Sent donation invoice to user {user_id} for {amount} stars with payload {payload_id}")
@@ -72,14 +204,15 @@ def register_payment_handlers(
             logging.error(f"Error sending donation invoice for user {user_id}: {e}", exc_info=True)
             error_key = ('donate_error_creating' if isinstance(e, telebot.apihelper.ApiTelegramException) 
                         else 'donate_error_unexpected')
-            _send_error_message(user_id, user_data.language, error_key)
+            _send_error_message(user_id, lang, error_key)
 
     def _handle_command_during_custom_input(message: Message, user_data, prompt_msg_id: Optional[int]) -> None:
+        lang = user_data.language
         user_data.state = BotState.NONE
         user_data.clear_custom_donation_prompt()
         
         if prompt_msg_id:
-            cancelled_text = get_translation(language=user_data.language, key='donation_cancelled')
+            cancelled_text = get_translation(language=lang, key='donation_cancelled')
             if not _safe_bot_action(bot.edit_message_text, cancelled_text, 
                                   chat_id=message.chat.id, message_id=prompt_msg_id, reply_markup=None):
                 _safe_bot_action(bot.delete_message, chat_id=message.chat.id, message_id=prompt_msg_id)
@@ -87,72 +220,62 @@ def register_payment_handlers(
         command = message.text.split(maxsplit=1)[0].lower()
         handler_func = command_handler_map_ref.get(command)
         
-        if handler_func and (command in allowed_commands_when_blocked_list or 
-                           not __import__('components.rate_limiter', fromlist=['is_user_blocked']).is_user_blocked(message.chat.id)):
+        if handler_func and (command in allowed_commands_when_blocked or 
+                           not is_user_blocked(message.chat.id)):
             try:
                 handler_func(message)
             except Exception:
-                _send_error_message(message.chat.id, user_data.language, 'error_executing_command')
+                _send_error_message(message.chat.id, lang, 'error_executing_command')
 
     def _create_owner_notification(user_id: int, username: Optional[str], amount: int, 
                                  payload: str, charge_id: str, was_blocked: bool, 
-                                 was_trusted: bool, is_donation: bool = True) -> str:
-        username_md = f"@{escape_markdown_v2(username)}" if username else "N/A"
-        
-        if is_donation:
-            notification = (f"💎 Received donation of {amount}⭐️ from user:\n"
-                          f"ID: `{user_id}`\nUsername: {username_md}\n"
-                          f"Payload: `{escape_markdown_v2(payload)}`\n"
-                          f"Charge ID: `{escape_markdown_v2(charge_id)}`")
-        else:
-            notification = (f"⚠️ Received unexpected successful payment:\n"
-                          f"User ID: `{user_id}` ({username_md})\n"
-                          f"Amount: {amount} XTR\n"
-                          f"Payload: `{escape_markdown_v2(payload)}`\n"
-                          f"Charge ID: `{escape_markdown_v2(charge_id)}`")
+                                 was_trusted: bool, is_blocked: bool, is_trusted: bool,
+                                 is_donation: bool = True) -> str:
+        template = _DONATION_NOTIFICATION_TEMPLATE if is_donation else _UNEXPECTED_PAYMENT_NOTIFICATION_TEMPLATE
+        notification = template.format(
+            user_id=user_id,
+            username_md=f"@{_escape_if_needed(username)}" if username else "N/A",
+            amount=amount,
+            payload=_escape_if_needed(payload),
+            charge_id=_escape_if_needed(charge_id)
+        )
         
         status_notes = []
-        current_user_data = get_user_data(user_id)
-        is_currently_blocked = current_user_data.blocked_until_timestamp is not None
-        is_currently_trusted = user_id in settings.TRUSTED_USERS_SET
-        
-        if was_blocked and not is_currently_blocked:
+        if was_blocked and not is_blocked:
             status_notes.append("User was blocked and is now unblocked.")
-        if not was_trusted and is_currently_trusted:
+        if not was_trusted and is_trusted:
             status_notes.append("User was not trusted and is now added to trusted list.")
         elif was_trusted and not was_blocked:
             status_notes.append("User was already trusted.")
         
         if status_notes:
-            notification += "\n\n*Status Change:* " + " ".join(status_notes)
-        
+            return f"{notification}\n\n*Status Change:* {' '.join(status_notes)}"
         return notification
 
     @bot.message_handler(commands=['donate'])
+    @skip_if_stale
     def donate_command_handler(message: Message) -> None:
-        if (hasattr(bot, 'BOT_START_TIME_REFERENCE') and 
-            message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp())):
-            return
-        
         user_id = message.chat.id
         user_data = get_user_data(user_id)
         user_data.state = BotState.NONE
+        lang = user_data.language
         
-        info_text = get_translation(language=user_data.language, key='donate_info')
-        if not _safe_bot_action(bot.send_message, user_id, info_text, parse_mode="Markdown"):
-            _safe_bot_action(bot.send_message, user_id, clean_markdown_text(info_text))
+        info_text, info_parse_mode = (donate_info_messages.get(lang)
+                                      or donate_info_messages[settings.DEFAULT_LANGUAGE])
+        if not _safe_bot_action(bot.send_message, user_id, info_text, parse_mode=info_parse_mode) and info_parse_mode:
+            plain_info_text = clean_markdown_text(get_translation(language=lang, key='donate_info'))
+            _safe_bot_action(bot.send_message, user_id, plain_info_text)
         
-        keyboard = _create_donation_keyboard(user_data.language)
-        select_amount_text = get_translation(language=user_data.language, key='select_donation_amount')
+        keyboard = _get_donation_keyboard(lang)
+        select_amount_text = get_translation(language=lang, key='select_donation_amount')
         _safe_bot_action(bot.send_message, user_id, select_amount_text, reply_markup=keyboard)
 
-    @bot.callback_query_handler(func=lambda call: call.data and call.data.startswith("donate_amount:"))
     def handle_donate_preset_amount_callback(call: CallbackQuery) -> None:
         user_id = call.from_user.id
         user_data = get_user_data(user_id)
         
         try:
-            amount = int(call.data.split(":", 1)[1])
+            amount = int(call.data[_DONATE_AMOUNT_PREFIX_LEN:])
             if amount < 1:
                 raise ValueError("Invalid amount")
             
@@ -162,9 +285,9 @@ def register_payment_handlers(
                            message_id=call.message.message_id, 
                            reply_markup=None)
             
-            _send_donation_invoice(user_id, amount)
+            _send_donation_invoice(user_id, amount, user_data.language)
             
-        except (ValueError, IndexError):
+        except ValueError:
             error_msg = get_translation(language=user_data.language, key='donate_error_unexpected')
             _safe_bot_action(bot.answer_callback_query, call.id, error_msg, show_alert=True)
             _safe_bot_action(bot.edit_message_reply_markup, 
@@ -172,10 +295,10 @@ def register_payment_handlers(
                            message_id=call.message.message_id, 
                            reply_markup=None)
 
-    @bot.callback_query_handler(func=lambda call: call.data == "donate_custom")
     def handle_donate_custom_amount_callback(call: CallbackQuery) -> None:
         user_id = call.from_user.id
         user_data = get_user_data(user_id)
+        lang = user_data.language
         
         _safe_bot_action(bot.answer_callback_query, call.id)
         _safe_bot_action(bot.edit_message_reply_markup, 
@@ -185,8 +308,8 @@ def register_payment_handlers(
         
         user_data.state = BotState.DONATE_CUSTOM_AMOUNT_INPUT
         
-        prompt_text = get_translation(language=user_data.language, key='enter_custom_amount')
-        cancel_button_text = get_translation(language=user_data.language, key='cancel_button')
+        prompt_text = get_translation(language=lang, key='enter_custom_amount')
+        cancel_button_text = get_translation(language=lang, key='cancel_button')
         keyboard = InlineKeyboardMarkup().add(
             InlineKeyboardButton(cancel_button_text, callback_data="cancel_donation")
         )
@@ -197,14 +320,12 @@ def register_payment_handlers(
         except Exception:
             user_data.state = BotState.NONE
 
-    @bot.message_handler(func=lambda message: get_user_data(message.chat.id).state == BotState.DONATE_CUSTOM_AMOUNT_INPUT)
+    @bot.message_handler(func=_is_custom_amount_input)
+    @skip_if_stale
     def handle_donate_custom_amount_input(message: Message) -> None:
-        if (hasattr(bot, 'BOT_START_TIME_REFERENCE') and 
-            message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp())):
-            return
-        
         user_id = message.chat.id
-        user_data = get_user_data(user_id)
+        user_data = getattr(message, '_user_data', None) or get_user_data(user_id)
+        lang = user_data.language
         prompt_msg_id = user_data.custom_donation_prompt_msg_id
         
         if message.text and message.text.startswith('/'):
@@ -212,29 +333,25 @@ def register_payment_handlers(
             return
         
         if not message.text:
-            error_msg = get_translation(language=user_data.language, key='donate_invalid_amount')
+            error_msg = get_translation(language=lang, key='donate_invalid_amount')
             _safe_bot_action(bot.reply_to, message, error_msg)
             return
         
-        try:
-            amount = int(message.text.strip())
-            if amount >= 1:
-                user_data.state = BotState.NONE
-                user_data.clear_custom_donation_prompt()
-                
-                if prompt_msg_id:
-                    _safe_bot_action(bot.delete_message, chat_id=user_id, message_id=prompt_msg_id)
-                
-                _send_donation_invoice(user_id, amount)
-            else:
-                error_msg = get_translation(language=user_data.language, key='donate_invalid_amount')
-                _safe_bot_action(bot.reply_to, message, error_msg)
-                
-        except ValueError:
-            error_msg = get_translation(language=user_data.language, key='donate_invalid_amount')
+        amount_text = message.text.strip()
+        # isascii() отсекает юникодные цифры вроде "²", которые isdigit() пропускает, а int() нет
+        amount = int(amount_text) if amount_text.isascii() and amount_text.isdigit() and len(amount_text) <= 9 else 0
+        if amount >= 1:
+            user_data.state = BotState.NONE
+            user_data.clear_custom_donation_prompt()
+            
+            if prompt_msg_id:
+                _safe_bot_action(bot.delete_message, chat_id=user_id, message_id=prompt_msg_id)
+            
+            _send_donation_invoice(user_id, amount, lang)
+        else:
+            error_msg = get_translation(language=lang, key='donate_invalid_amount')
             _safe_bot_action(bot.reply_to, message, error_msg)
 
-    @bot.callback_query_handler(func=lambda call: call.data == "cancel_donation")
     def handle_cancel_donation_callback(call: CallbackQuery) -> None:
         user_id = call.from_user.id
         user_data = get_user_data(user_id)
@@ -253,30 +370,43 @@ def register_payment_handlers(
                            chat_id=call.message.chat.id, 
                            message_id=call.message.message_id)
 
+    exact_callback_dispatch = {
+        "donate_custom": handle_donate_custom_amount_callback,
+        "cancel_donation": handle_cancel_donation_callback,
+    }
+
+    @bot.callback_query_handler(func=lambda call: call.data is not None and call.data.startswith(_DONATION_CALLBACK_PREFIXES))
+    def donation_callback_dispatcher(call: CallbackQuery) -> None:
+        if call.data.startswith(_DONATE_AMOUNT_PREFIX):
+            handle_donate_preset_amount_callback(call)
+            return
+        callback_handler = exact_callback_dispatch.get(call.data)
+        if callback_handler:
+            callback_handler(call)
+
+    def _reject_pre_checkout(query: PreCheckoutQuery, error_key: str) -> None:
+        error_msg = get_translation(language=get_user_data(query.from_user.id).language, key=error_key)
+        bot.answer_pre_checkout_query(query.id, ok=False, error_message=error_msg)
+
     @bot.pre_checkout_query_handler(func=lambda query: True)
     def pre_checkout_handler(query: PreCheckoutQuery) -> None:
-        user_data = get_user_data(query.from_user.id)
-        
-        if not query.invoice_payload or not query.invoice_payload.startswith("donate_"):
-            error_msg = get_translation(language=user_data.language, key='precheckout_failed_invalid_id')
-            bot.answer_pre_checkout_query(query.id, ok=False, error_message=error_msg)
+        payload = query.invoice_payload or ''
+        if not payload.startswith(_DONATE_PAYLOAD_PREFIX):
+            _reject_pre_checkout(query, 'precheckout_failed_invalid_id')
             return
         
-        if query.currency != "XTR" or query.total_amount < 1:
-            error_msg = get_translation(language=user_data.language, key='precheckout_failed_wrong_amount')
-            bot.answer_pre_checkout_query(query.id, ok=False, error_message=error_msg)
+        if query.currency != _STARS_CURRENCY or query.total_amount < 1:
+            _reject_pre_checkout(query, 'precheckout_failed_wrong_amount')
             return
         
         bot.answer_pre_checkout_query(query.id, ok=True)
 
     @bot.message_handler(content_types=['successful_payment'])
+    @skip_if_stale
     def success_payment_handler(message: Message) -> None:
-        if (hasattr(bot, 'BOT_START_TIME_REFERENCE') and 
-            message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp())):
-            return
-        
         user_id = message.from_user.id
         user_data = get_user_data(user_id)
+        lang = user_data.language
         payment_info = message.successful_payment
         
         if not payment_info:
@@ -290,43 +420,45 @@ def register_payment_handlers(
         logging.info(f"Successful payment: User={user_id}, Amount={amount}{currency}, "
                     f"Payload={payload}, ChargeID={charge_id}")
         
+        trusted_set = settings.TRUSTED_USERS_SET
+        owner_id = settings.BOT_OWNER_USER_ID
         was_blocked = user_data.blocked_until_timestamp is not None
-        was_trusted = user_id in settings.TRUSTED_USERS_SET
+        was_trusted = user_id in trusted_set
         
-        if user_data.blocked_until_timestamp:
+        if was_blocked:
             user_data.unblock()
         
-        if user_id not in settings.TRUSTED_USERS_SET:
+        if not was_trusted:
             add_trusted_user_db(user_id)
-            settings._trusted_users_set_cache = None
+            settings.add_trusted_user_to_cache(user_id)
             logging.info(f"User {user_id} automatically added to trusted list after successful payment.")
         
-        check_and_unblock_if_trusted(user_id, settings.TRUSTED_USERS_SET)
+        check_and_unblock_if_trusted(user_id, trusted_set)
+        is_trusted = user_id in trusted_set
+        
+        is_donation = payload and payload.startswith(_DONATE_PAYLOAD_PREFIX)
         
-        is_donation = payload and payload.startswith("donate_")
+        # Уведомление владельцу ставим в очередь до ответа пользователю - воркер отправит его параллельно
+        if owner_id:
+            notification = _create_owner_notification(
+                user_id, message.from_user.username, amount, payload, 
+                charge_id, was_blocked, was_trusted,
+                user_data.blocked_until_timestamp is not None, is_trusted, is_donation
+            )
+            owner_notification_queue.put(notification)
         
         if is_donation:
-            thank_you_msg = get_translation(language=user_data.language, key='payment_success', amount=amount)
+            thank_you_msg = get_translation(language=lang, key='payment_success', amount=amount)
             _safe_bot_action(bot.send_message, message.chat.id, thank_you_msg)
         else:
-            generic_thank_you = get_translation(language=user_data.language, key='unknown_payload')
-            if not was_trusted and user_id in settings.TRUSTED_USERS_SET:
+            generic_thank_you = get_translation(language=lang, key='unknown_payload')
+            if is_trusted and not was_trusted:
                 generic_thank_you += "\n\nYou have been granted trusted status."
             _safe_bot_action(bot.send_message, message.chat.id, generic_thank_you)
-        
-        if settings.BOT_OWNER_USER_ID:
-            notification = _create_owner_notification(
-                user_id, message.from_user.username, amount, payload, 
-                charge_id, was_blocked, was_trusted, is_donation
-            )
-            _safe_bot_action(bot.send_message, settings.BOT_OWNER_USER_ID, notification, parse_mode="Markdown")
 
     @bot.message_handler(commands=['paysupport'])
+    @skip_if_stale
     def pay_support_handler(message: Message) -> None:
-        if (hasattr(bot, 'BOT_START_TIME_REFERENCE') and 
-            message.date < int(bot.BOT_START_TIME_REFERENCE.timestamp())):
-            return
-        
         user_id = message.chat.id
         user_data = get_user_data(user_id)
         user_data.state = BotState.NONE
@@ -346,11 +478,10 @@ def register_payment_handlers(
                                 f"Chat ID: `{message.chat.id}`")
             
             if (user_data.blocked_until_timestamp and 
-                datetime.now(timezone.utc) < user_data.blocked_until_timestamp):
+                time.time() < user_data.blocked_until_timestamp.timestamp()):
                 owner_notification += "\n\n*Note: This user is currently blocked.*"
             
-            _safe_bot_action(bot.send_message, settings.BOT_OWNER_USER_ID, 
-                           owner_notification, parse_mode="Markdown")
+            owner_notification_queue.put(owner_notification)
 
     command_handler_map_ref['/donate'] = donate_command_handler
     command_handler_map_ref['/paysupport'] = pay_support_handler